@@ -13,6 +13,7 @@ from flask_login import (
     LoginManager, login_user, login_required,
     logout_user, current_user
 )
+from werkzeug.local import LocalProxy
 
 # email_validator opcional
 try:
@@ -27,10 +28,21 @@ from sqlalchemy import func, text, or_
 from werkzeug.utils import secure_filename
 
 from models import (
-    db, User, PokemonProducto, Order, OrderItem, ProductView,
-    PromoCode, Wishlist, Review, CartItem
+    db, User, PokemonProducto, Wishlist, CartItem, enable_sqlite_wal
 )
 
+from services.checkout_service import checkout_cart
+from services.promo_service import normalize_code, validate_code, apply_discount
+from services.orders_service import orders_page
+from services.product_page_service import load_product_page
+from services.view_events_service import ViewEventQueue
+from services.top_sellers_service import top_sellers
+from services.copurchase_service import also_bought, also_bought_for_cart
+from services.reviews_service import save_review, delete_review as delete_review_row
+from services.catalog_service import catalog_card_data
+from services.price_history_service import price_series
+from services.fx_service import STORE_CURRENCY, load_rates_file, save_rates
+
 # Precio dinámico opcional (fallback al precio_base)
 try:
     from services.precio_dinamico_service import PrecioDinamicoService
@@ -39,6 +51,8 @@ except Exception:
         def calcular_precio(self, p, user):
             base = float(getattr(p, "precio_base", 0.0) or 0.0)
             return base, [], {}
+        def calcular_precios(self, productos, user):
+            return {p.id: self.calcular_precio(p, user) for p in productos}
 
 # AI opcional (búsqueda semántica / RAG)
 try:
@@ -82,10 +96,25 @@ def create_app():
     app.config["UPLOAD_FOLDER"] = os.path.join(app.root_path, "uploads")
     app.config["MAX_CONTENT_LENGTH"] = 5 * 1024 * 1024
     app.config["JSON_AS_ASCII"] = False
+    app.config["VIEW_EVENTS_BATCH"] = int(os.environ.get("VIEW_EVENTS_BATCH", 200))
+    app.config["VIEW_EVENTS_FLUSH_MS"] = int(os.environ.get("VIEW_EVENTS_FLUSH_MS", 500))
+    app.config["VIEW_EVENTS_MAXSIZE"] = int(os.environ.get("VIEW_EVENTS_MAXSIZE", 10000))
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
     db.init_app(app)
     csrf.init_app(app)
+    with app.app_context():
+        enable_sqlite_wal(db.engine)
+        # vistas de producto: cola acotada + hilo que escribe por lotes
+        # (el hilo arranca con la primera vista, no aquí)
+        view_events = ViewEventQueue(
+            db.engine,
+            batch_size=app.config["VIEW_EVENTS_BATCH"],
+            flush_ms=app.config["VIEW_EVENTS_FLUSH_MS"],
+            maxsize=app.config["VIEW_EVENTS_MAXSIZE"],
+            logger=app.logger,
+        )
+    app.extensions["view_events"] = view_events
 
     @app.after_request
     def ensure_utf8(resp):
@@ -104,11 +133,7 @@ def create_app():
         def get_cart_qty():
             try:
                 if current_user.is_authenticated:
-                    return int(
-                        db.session.query(func.coalesce(func.sum(CartItem.quantity), 0))
-                        .filter(CartItem.user_id == current_user.id)
-                        .scalar() or 0
-                    )
+                    return cart_qty_for(current_user.id)
                 return sum(int(q) for q in session.get("cart", {}).values())
             except Exception:
                 return 0
@@ -118,9 +143,35 @@ def create_app():
             has_packs=("packs_bp" in app.blueprints),
             has_endpoint=has_endpoint,
             current_app=flask_current_app,
-            cart_qty=get_cart_qty(),
+            # perezoso: solo se calcula si la plantilla lee cart_qty
+            cart_qty=LocalProxy(get_cart_qty),
+            store_currency=STORE_CURRENCY,
         )
 
+    # Contador del carrito por usuario, cacheado en proceso; los helpers de
+    # carrito lo invalidan al mutar (el TTL acota lo que vea otro proceso)
+    _cart_qty_cache = {}
+    _CART_QTY_CACHE_TTL_SECONDS = 300
+    _CART_QTY_CACHE_MAX = 10000
+
+    def cart_qty_for(user_id: int) -> int:
+        now = time.time()
+        hit = _cart_qty_cache.get(user_id)
+        if hit is not None and now - hit[1] < _CART_QTY_CACHE_TTL_SECONDS:
+            return hit[0]
+        qty = int(
+            db.session.query(func.coalesce(func.sum(CartItem.quantity), 0))
+            .filter(CartItem.user_id == user_id)
+            .scalar() or 0
+        )
+        if len(_cart_qty_cache) >= _CART_QTY_CACHE_MAX:
+            _cart_qty_cache.clear()
+        _cart_qty_cache[user_id] = (qty, now)
+        return qty
+
+    def invalidate_cart_qty(user_id: int):
+        _cart_qty_cache.pop(user_id, None)
+
     login_manager = LoginManager(app)
     login_manager.login_view = "login"
 
@@ -139,13 +190,27 @@ def create_app():
             session["cart"] = {}
         return session["cart"]
 
+    # Upserts sobre uq_cart_item(user_id, product_id): una sentencia por operación,
+    # sin SELECT previo (executemany si son varias filas)
+    _CART_ADD_SQL = text("""
+        INSERT INTO cart_items(user_id, product_id, quantity, updated_at)
+        VALUES (:u, :p, MIN(99, :q), :ts)
+        ON CONFLICT(user_id, product_id) DO UPDATE SET
+          quantity = MIN(99, cart_items.quantity + excluded.quantity),
+          updated_at = excluded.updated_at
+    """)
+    _CART_SET_SQL = text("""
+        INSERT INTO cart_items(user_id, product_id, quantity, updated_at)
+        VALUES (:u, :p, MIN(99, :q), :ts)
+        ON CONFLICT(user_id, product_id) DO UPDATE SET
+          quantity = excluded.quantity,
+          updated_at = excluded.updated_at
+    """)
+
     def add_to_cart_db(user_id: int, product_id: int, qty: int):
-        ci = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-        if ci:
-            ci.quantity = min(99, ci.quantity + qty)
-        else:
-            db.session.add(CartItem(user_id=user_id, product_id=product_id, quantity=min(99, qty)))
+        db.session.execute(_CART_ADD_SQL, {"u": user_id, "p": product_id, "q": qty, "ts": datetime.utcnow()})
         db.session.commit()
+        invalidate_cart_qty(user_id)
 
     def get_cart_items_db(user_id: int):
         rows = (
@@ -159,28 +224,42 @@ def create_app():
     def clear_cart_db(user_id: int):
         CartItem.query.filter_by(user_id=user_id).delete()
         db.session.commit()
+        invalidate_cart_qty(user_id)
 
     def update_cart_db_bulk(user_id: int, updates):
-        for pid, qty in updates.items():
-            ci = CartItem.query.filter_by(user_id=user_id, product_id=pid).first()
-            if qty <= 0:
-                if ci:
-                    db.session.delete(ci)
-            else:
-                if ci:
-                    ci.quantity = min(99, qty)
-                else:
-                    db.session.add(CartItem(user_id=user_id, product_id=pid, quantity=min(99, qty)))
+        to_delete = [int(pid) for pid, qty in updates.items() if qty <= 0]
+        now = datetime.utcnow()
+        to_set = [
+            {"u": user_id, "p": int(pid), "q": int(qty), "ts": now}
+            for pid, qty in updates.items() if qty > 0
+        ]
+        if to_delete:
+            CartItem.query.filter(
+                CartItem.user_id == user_id, CartItem.product_id.in_(to_delete)
+            ).delete(synchronize_session=False)
+        if to_set:
+            db.session.execute(_CART_SET_SQL, to_set)
         db.session.commit()
+        invalidate_cart_qty(user_id)
 
     def remove_from_cart_db(user_id: int, product_id: int):
         CartItem.query.filter_by(user_id=user_id, product_id=product_id).delete()
         db.session.commit()
+        invalidate_cart_qty(user_id)
 
     def merge_session_cart_to_db(user_id: int):
         cart = session.get("cart", {})
+        now = datetime.utcnow()
+        rows = []
         for pid, qty in cart.items():
-            add_to_cart_db(user_id, int(pid), int(qty))
+            try:
+                rows.append({"u": user_id, "p": int(pid), "q": int(qty), "ts": now})
+            except (TypeError, ValueError):
+                continue
+        if rows:
+            db.session.execute(_CART_ADD_SQL, rows)
+            db.session.commit()
+            invalidate_cart_qty(user_id)
         session.pop("cart", None)
 
     def cart_items_with_products():
@@ -192,9 +271,9 @@ def create_app():
                 .filter(CartItem.user_id == current_user.id)
                 .all()
             )
+            prices = precio_service.calcular_precios([p for _, p in rows], current_user)
             for ci, p in rows:
-                precio, _, _ = precio_service.calcular_precio(p, current_user)
-                out.append({"product": p, "qty": ci.quantity, "unit_price": precio})
+                out.append({"product": p, "qty": ci.quantity, "unit_price": prices[p.id][0]})
             return out
         else:
             cart = session.get("cart", {})
@@ -203,14 +282,14 @@ def create_app():
             pids = [int(pid) for pid in cart.keys()]
             products = PokemonProducto.query.filter(PokemonProducto.id.in_(pids)).all()
             products_map = {p.id: p for p in products}
+            prices = precio_service.calcular_precios(products, None)
             for pid_str, qty_str in cart.items():
                 pid = int(pid_str)
                 qty = int(qty_str)
                 p = products_map.get(pid)
                 if not p:
                     continue
-                precio, _, _ = precio_service.calcular_precio(p, None)
-                out.append({"product": p, "qty": qty, "unit_price": precio})
+                out.append({"product": p, "qty": qty, "unit_price": prices[pid][0]})
             return out
 
     # ---------- FTS5 utilidades
@@ -345,7 +424,8 @@ def create_app():
     def cart_page():
         items = cart_items_with_products()
         total = round(sum(float(i["unit_price"]) * int(i["qty"]) for i in items), 2)
-        return render_template("cart.html", items=items, total=total)
+        also = also_bought_for_cart(i["product"].id for i in items)
+        return render_template("cart.html", items=items, total=total, also=also)
 
     @app.route("/cart/add/<int:pid>", methods=["POST"], endpoint="cart_add")
     def cart_add(pid: int):
@@ -426,89 +506,46 @@ def create_app():
     @app.route("/checkout", methods=["GET", "POST"], endpoint="checkout")
     @login_required
     def checkout():
-        items = cart_items_with_products()
-        if not items:
-            flash("Tu carrito está vacío.", "info")
-            return redirect(url_for("cart"))
-
-        total = round(sum(float(i["unit_price"]) * int(i["qty"]) for i in items), 2)
+        coupon = normalize_code(request.values.get("coupon"))
+        if request.method == "GET":
+            items = cart_items_with_products()
+            if not items:
+                flash("Tu carrito está vacío.", "info")
+                return redirect(url_for("cart"))
+            total = round(sum(float(i["unit_price"]) * int(i["qty"]) for i in items), 2)
+            # vista previa del cupón desde la caché (sin consulta)
+            promo = validate_code(coupon) if coupon else None
+            if coupon and not promo:
+                flash("El cupón no es válido o ya se agotó.", "warning")
+            return render_template(
+                "checkout.html", items=items, total=apply_discount(total, promo),
+                subtotal=total, promo=promo, coupon=coupon
+            )
 
         try:
-            # Verificar stock antes de crear la orden
-            for item in items:
-                product = item["product"]
-                requested_qty = item["qty"]
-                if product.stock < requested_qty:
-                    flash(f"No hay suficiente stock para {product.nombre}. Disponible: {product.stock}, Solicitado: {requested_qty}", "error")
-                    return redirect(url_for("cart"))
-
-            order = Order(user_id=current_user.id)
-            if hasattr(order, "total"):
-                order.total = total
-            elif hasattr(order, "total_amount"):
-                order.total_amount = total
-            elif hasattr(order, "amount"):
-                order.amount = total
-            if hasattr(order, "status"):
-                try:
-                    order.status = "created"
-                except Exception:
-                    pass
-
-            db.session.add(order)
-            db.session.flush()  # order.id para los OrderItems
-
-            for it in items:
-                prod = it["product"]
-                pid = int(getattr(prod, "id"))
-                qty = int(it["qty"])
-                unit_price = float(it["unit_price"])
-
-                # Decrementar stock
-                prod.stock -= qty
-                if prod.stock < 0:
-                    prod.stock = 0
-
-                product_name = (
-                    getattr(prod, "nombre", None)
-                    or getattr(prod, "name", None)
-                    or f"Producto {pid}"
-                )
-
-                oi = OrderItem(order_id=order.id, product_id=pid, quantity=qty)
-
-                if hasattr(oi, "product_name"):
-                    oi.product_name = product_name
-                if hasattr(oi, "unit_price"):
-                    oi.unit_price = unit_price
-                elif hasattr(oi, "price"):
-                    oi.price = unit_price
-                elif hasattr(oi, "unit_amount"):
-                    oi.unit_amount = unit_price
-                if hasattr(oi, "currency"):
-                    oi.currency = getattr(prod, "market_currency", None) or "$"
-                if hasattr(oi, "image_url") and getattr(prod, "image_url", None):
-                    oi.image_url = prod.image_url
-                if hasattr(oi, "product_sku") and getattr(prod, "card_number", None):
-                    oi.product_sku = prod.card_number
-
-                db.session.add(oi)
-
-            db.session.commit()
+            # Precios en lote + reserva de stock + cupón + orden + items + carrito vacío, un solo commit
+            res = checkout_cart(
+                current_user, promo_code=coupon or None,
+                ship_name=(request.form.get("name") or "").strip() or None,
+                ship_address=(request.form.get("address") or "").strip() or None,
+            )
         except Exception as e:
             db.session.rollback()
             flash(f"Error al crear el pedido: {e}. Por favor, inténtalo de nuevo.", "error")
             # Log the full exception for debugging
             flask_current_app.logger.error(f"Checkout error: {e}", exc_info=True)
             return redirect(url_for("cart"))
+        finally:
+            invalidate_cart_qty(current_user.id)
+        if not res["ok"]:
+            if res.get("promo_code"):
+                flash(res["error"], "warning")
+                return redirect(url_for("checkout"))
+            # sin product_id = carrito vacío; con product_id = falta de stock
+            flash(res["error"], "error" if res.get("product_id") else "info")
+            return redirect(url_for("cart"))
 
-        # Vacía el carrito
-        try:
-            clear_cart_db(current_user.id)
-        except Exception:
-            session.pop("cart", None)
-
-        flash(f"Pedido #{getattr(order, 'id', '?')} creado. ¡Gracias!", "success")
+        flash(f"Pedido #{res['order_id']} creado. ¡Gracias!", "success")
         try:
             if "orders_list" in app.view_functions:
                 return redirect(url_for("orders_list"))
@@ -516,6 +553,14 @@ def create_app():
             pass
         return redirect(url_for("index"))
 
+    # ---------- Pedidos
+    @app.get("/orders", endpoint="orders_list")
+    @login_required
+    def orders_list():
+        page = orders_page(current_user.id, cursor=request.args.get("cursor"),
+                           limit=request.args.get("limit", 10, type=int))
+        return render_template("orders.html", orders=page["orders"], next_cursor=page["next_cursor"])
+
     # ---------- Wishlist
     @app.get("/wishlist", endpoint="wishlist")
     @login_required
@@ -771,6 +816,8 @@ def create_app():
         rare = request.args.get("rare", "", type=str).strip()
         lang = request.args.get("lang", "", type=str).strip()
         cond = request.args.get("cond", "", type=str).strip()
+        pmin = request.args.get("pmin", None, type=float)
+        pmax = request.args.get("pmax", None, type=float)
 
         qry = PokemonProducto.query
 
@@ -791,7 +838,13 @@ def create_app():
         if tipo:
             qry = qry.filter(PokemonProducto.tipo.ilike(tipo))
         if cat:
-            qry = qry.filter(PokemonProducto.categoria.ilike(cat))
+            qry = qry.filter(PokemonProducto.categoria == cat)
+        # rango y orden por precio de lista (índice categoria+list_price); el
+        # ajuste dinámico por usuario se aplica solo a la página visible
+        if pmin is not None:
+            qry = qry.filter(PokemonProducto.list_price >= pmin)
+        if pmax is not None:
+            qry = qry.filter(PokemonProducto.list_price <= pmax)
 
         if cat == "tcg":
             if exp:
@@ -804,9 +857,9 @@ def create_app():
                 qry = qry.filter(PokemonProducto.condition == cond)
 
         if sort == "price_asc":
-            qry = qry.order_by(PokemonProducto.precio_base.asc())
+            qry = qry.order_by(PokemonProducto.list_price.asc(), PokemonProducto.id.asc())
         elif sort == "price_desc":
-            qry = qry.order_by(PokemonProducto.precio_base.desc())
+            qry = qry.order_by(PokemonProducto.list_price.desc(), PokemonProducto.id.desc())
         else:
             qry = qry.order_by(PokemonProducto.created_at.desc())
 
@@ -819,36 +872,15 @@ def create_app():
         )
         facets = tcg_facets() if cat == "tcg" else {"exp": [], "rare": [], "lang": [], "cond": []}
 
-        computed_prices = {}
-        user = current_user if current_user.is_authenticated else None
-        for p in pag.items:
-            try:
-                dyn_price, _, _ = precio_service.calcular_precio(p, user)
-            except Exception as e:
-                flask_current_app.logger.error(f"Error calculating dynamic price for product {p.id}: {e}", exc_info=True)
-                dyn_price = float(getattr(p, "precio_base", 0.0) or 0.0)
-
-            if getattr(p, "market_price", None):
-                price_val = round(float(p.market_price), 2)
-                curr = (p.market_currency or "").upper()
-                using_market = True
-                source = getattr(p, "market_source", None)
-            else:
-                price_val = round(float(dyn_price), 2)
-                curr = "$"; using_market = False; source = None
-
-            computed_prices[p.id] = {
-                "price": price_val,
-                "currency": curr,
-                "using_market": using_market,
-                "source": source,
-            }
+        computed_prices = catalog_card_data(
+            pag.items, current_user if current_user.is_authenticated else None
+        )
 
         return render_template(
             "index.html",
             products=pag.items, q=q, tipo=tipo, sort=sort, cat=cat, pag=pag,
             featured_tcg=featured_tcg, facets=facets,
-            exp=exp, rare=rare, lang=lang, cond=cond,
+            exp=exp, rare=rare, lang=lang, cond=cond, pmin=pmin, pmax=pmax,
             computed_prices=computed_prices
         )
 
@@ -857,63 +889,42 @@ def create_app():
     def product_detail(pid: int):
         p = PokemonProducto.query.get_or_404(pid)
         if current_user.is_authenticated:
-            db.session.add(ProductView(user_id=current_user.id, product_id=p.id))
-            db.session.commit()
+            view_events.record(current_user.id, p.id)
 
         precio, razones, feats = precio_service.calcular_precio(
             p, current_user if current_user.is_authenticated else None
         )
 
-        q = (
-            db.session.query(
-                PokemonProducto,
-                func.coalesce(func.sum(OrderItem.quantity), 0).label("sold"),
-            )
-            .outerjoin(OrderItem, OrderItem.product_id == PokemonProducto.id)
-            .filter(PokemonProducto.tipo == p.tipo, PokemonProducto.id != p.id)
-            .group_by(PokemonProducto.id)
-            .order_by(func.coalesce(func.sum(OrderItem.quantity), 0).desc())
-            .limit(4)
-            .all()
-        )
-        recs = [r[0] for r in q] or (
-            PokemonProducto.query.filter(
-                PokemonProducto.tipo == p.tipo, PokemonProducto.id != p.id
-            )
-            .order_by(PokemonProducto.created_at.desc())
-            .limit(4)
-            .all()
-        )
-
-        reviews = (
-            Review.query.filter_by(product_id=p.id)
-            .order_by(Review.created_at.desc())
-            .all()
-        )
-        avg_rating = round(sum(r.rating for r in reviews) / len(reviews), 2) if reviews else None
-        my_review = (
-            Review.query.filter_by(product_id=p.id, user_id=current_user.id).first()
-            if current_user.is_authenticated else None
-        )
-        purchasers = {
-            uid for (uid,) in (
-                db.session.query(Order.user_id)
-                .join(OrderItem, Order.id == OrderItem.order_id)
-                .filter(OrderItem.product_id == p.id)
+        recs = top_sellers("tipo", p.tipo, exclude_id=p.id, limit=4)
+        if len(recs) < 4:
+            # pocos vendidos en el tipo: se completa con los más nuevos
+            seen = [p.id] + [r.id for r in recs]
+            recs += (
+                PokemonProducto.query.filter(
+                    PokemonProducto.tipo == p.tipo, PokemonProducto.id.notin_(seen)
+                )
+                .order_by(PokemonProducto.created_at.desc())
+                .limit(4 - len(recs))
                 .all()
             )
-        }
-        in_wishlist = (
-            Wishlist.query.filter_by(user_id=current_user.id, product_id=p.id).first() is not None
-            if current_user.is_authenticated else False
+
+        page = load_product_page(
+            p, current_user.id if current_user.is_authenticated else None,
+            reviews_before=request.args.get("reviews_before", type=int),
         )
 
         return render_template(
             "product.html", p=p, precio=precio, razones=razones, feats=feats, recs=recs,
-            reviews=reviews, avg_rating=avg_rating, my_review=my_review,
-            purchasers=purchasers, in_wishlist=in_wishlist
+            also=also_bought(p.id, limit=4), **page
         )
 
+    @app.get("/product/<int:pid>/price_history", endpoint="product_price_history")
+    def product_price_history(pid: int):
+        """Serie de precios de mercado para el sparkline de la ficha (?days=90)."""
+        PokemonProducto.query.get_or_404(pid)
+        days = max(1, min(365, request.args.get("days", 90, type=int)))
+        return jsonify({"product_id": pid, "days": days, "points": price_series(pid, days)})
+
     # ---------- Reseñas (reviews)
     @app.route("/product/<int:pid>/review", methods=["POST"], endpoint="post_review")
     @login_required
@@ -937,25 +948,9 @@ def create_app():
             flash("Selecciona una puntuación (1-5).", "warning")
             return redirect(url_for("product_detail", pid=pid))
 
-        rv = Review.query.filter_by(product_id=pid, user_id=current_user.id).first()
-        if rv:
-            rv.rating = rating
-            for attr in ("comment", "content", "text", "body"):
-                if hasattr(rv, attr):
-                    setattr(rv, attr, comment)
-            if hasattr(rv, "updated_at"):
-                rv.updated_at = datetime.utcnow()
-            db.session.commit()
+        if save_review(pid, current_user.id, rating, comment) == "updated":
             flash("Reseña actualizada.", "success")
         else:
-            rv = Review(product_id=pid, user_id=current_user.id, rating=rating)
-            for attr in ("comment", "content", "text", "body"):
-                if hasattr(rv, attr):
-                    setattr(rv, attr, comment)
-            if hasattr(rv, "created_at"):
-                rv.created_at = datetime.utcnow()
-            db.session.add(rv)
-            db.session.commit()
             flash("Gracias por tu reseña.", "success")
 
         return redirect(url_for("product_detail", pid=pid) + "#reviews")
@@ -963,10 +958,7 @@ def create_app():
     @app.route("/product/<int:pid>/review/delete", methods=["POST"], endpoint="delete_review")
     @login_required
     def delete_review(pid: int):
-        rv = Review.query.filter_by(product_id=pid, user_id=current_user.id).first()
-        if rv:
-            db.session.delete(rv)
-            db.session.commit()
+        if delete_review_row(pid, current_user.id):
             flash("Reseña eliminada.", "success")
         else:
             flash("No tenías reseña para este producto.", "info")
@@ -1001,30 +993,14 @@ def create_app():
         precio, razones, feats = precio_service.calcular_precio(
             p, current_user if current_user.is_authenticated else None
         )
-        reviews = Review.query.filter_by(product_id=p.id).order_by(Review.created_at.desc()).all()
-        avg_rating = round(sum(r.rating for r in reviews) / len(reviews), 2) if reviews else None
-        my_review = (
-            Review.query.filter_by(product_id=p.id, user_id=current_user.id).first()
-            if current_user.is_authenticated else None
-        )
-        purchasers = {
-            uid for (uid,) in (
-                db.session.query(Order.user_id)
-                .join(OrderItem, Order.id == OrderItem.order_id)
-                .filter(OrderItem.product_id == p.id)
-                .all()
-            )
-        }
-        in_wishlist = (
-            Wishlist.query.filter_by(user_id=current_user.id, product_id=p.id).first() is not None
-            if current_user.is_authenticated else False
+        page = load_product_page(
+            p, current_user.id if current_user.is_authenticated else None,
+            reviews_before=request.args.get("reviews_before", type=int),
         )
 
         return render_template(
             "product.html", p=p, precio=precio, razones=razones, feats=feats,
-            reviews=reviews, avg_rating=avg_rating, my_review=my_review,
-            purchasers=purchasers, in_wishlist=in_wishlist,
-            ai_q=q, ai_answer=ai_answer
+            ai_q=q, ai_answer=ai_answer, **page
         )
 
     # ---------- Admin (incluye campos TCG + upload)
@@ -1093,6 +1069,8 @@ def create_app():
             ).fetchone()
             if not row:
                 db.create_all()
+                save_rates(load_rates_file())
+                db.session.commit()
                 app.logger.info("Tablas base creadas (productos, users, etc.)")
         except Exception as e:
             app.logger.warning(f"auto create tables failed: {e}")
@@ -1,11 +1,29 @@
 ﻿from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
 
 db = SQLAlchemy()
 
+def enable_sqlite_wal(engine, busy_timeout_ms: int = 15000):
+    """
+    Activa WAL + busy_timeout en cada conexión SQLite: los lectores no bloquean
+    al escritor y los escritores concurrentes esperan en vez de fallar con
+    "database is locked".
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cur.close()
+
 class UserCard(db.Model):
     __tablename__ = "user_cards"
     id = db.Column(db.Integer, primary_key=True)
@@ -27,6 +45,10 @@ class User(UserMixin, db.Model):
     favoritos_tipos = db.Column(db.Text, default="[]")
     full_name = db.Column(db.String(200))        # NUEVO
     ship_address = db.Column(db.String(400))     # NUEVO
+    star_points = db.Column(db.Integer, nullable=False, default=0)  # saldo materializado de star_ledgers
+    __table_args__ = (
+        db.Index("ix_users_star_points", db.text("star_points DESC"), "id"),
+    )
 
     def set_password(self, pw):
         self.password_hash = generate_password_hash(pw)
@@ -59,10 +81,31 @@ class PokemonProducto(db.Model):
 
     # NUEVO v8: id y precio de mercado
     tcg_card_id = db.Column(db.String(80))           # ej: "sv2-12"
+    content_hash = db.Column(db.String(40))          # sha1 de los campos del upstream (diff del importador)
+    retired_at = db.Column(db.DateTime)              # baja upstream con historial (stock 0, fuera del diff)
     market_price = db.Column(db.Float)               # precio de mercado en USD
     market_currency = db.Column(db.String(8), default="USD")
     market_source = db.Column(db.String(80))         # p. ej. "pokemontcg.io/tcgplayer.market"
-    market_updated_at = db.Column(db.String(32))     # timestamp texto
+    market_updated_at = db.Column(db.DateTime, index=True)  # última verificación del precio (frescura)
+    market_price_norm = db.Column(db.Float, index=True)     # market_price en la moneda de la tienda
+    # Precio de lista efectivo (el que ordena/filtra el catálogo): columna
+    # generada, SQLite la mantiene sola al cambiar precio base o de mercado
+    list_price = db.Column(db.Float, db.Computed("COALESCE(market_price_norm, precio_base)", persisted=False))
+
+    # Agregados de reseñas (se mantienen en la misma transacción que la reseña)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_productos_categoria_list_price", "categoria", "list_price"),
+        db.Index("ix_productos_list_price", "list_price"),
+        db.Index("idx_product_tcg_id_unique", "tcg_card_id", unique=True,
+                 sqlite_where=db.text("tcg_card_id IS NOT NULL AND tcg_card_id <> ''")),
+    )
+
+    @property
+    def avg_rating(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
 
 class ProductView(db.Model):
     __tablename__ = "product_views"
@@ -81,6 +124,9 @@ class Order(db.Model):
     ship_name = db.Column(db.String(200))
     ship_address = db.Column(db.String(300))
     items = db.relationship("OrderItem", backref="order", cascade="all,delete-orphan")
+    __table_args__ = (
+        db.Index("ix_orders_user_created", "user_id", "created_at"),
+    )
 
 class OrderItem(db.Model):
     __tablename__ = "order_items"
@@ -91,6 +137,69 @@ class OrderItem(db.Model):
     unit_price = db.Column(db.Float, nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
 
+class FxRate(db.Model):
+    """Cuántas unidades de la moneda de la tienda vale 1 unidad de `currency`."""
+    __tablename__ = "fx_rates"
+    currency = db.Column(db.String(8), primary_key=True)
+    rate_to_store = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(80))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PriceHistory(db.Model):
+    """Historial append-only de precios de mercado (solo puntos de cambio)."""
+    __tablename__ = "price_history"
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("productos.id"), nullable=False)
+    ts = db.Column(db.DateTime, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(8))
+    source = db.Column(db.String(40))
+    __table_args__ = (db.Index("ix_price_history_product_ts", "product_id", "ts"),)
+
+class ProductSales(db.Model):
+    """Unidades vendidas por producto (se suma en el mismo commit del checkout)."""
+    __tablename__ = "product_sales"
+    product_id = db.Column(db.Integer, db.ForeignKey("productos.id"), primary_key=True)
+    sold = db.Column(db.Integer, nullable=False, default=0)
+
+class TopSeller(db.Model):
+    """Ranking materializado de más vendidos por scope ("tipo" | "expansion" | "set")."""
+    __tablename__ = "top_sellers"
+    scope = db.Column(db.String(16), primary_key=True)
+    scope_key = db.Column(db.String(120), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("productos.id"), nullable=False)
+    sold = db.Column(db.Integer, nullable=False, default=0)
+
+class CoPurchaseItem(db.Model):
+    """Cestas (pedidos / colecciones) que contienen cada producto."""
+    __tablename__ = "copurchase_items"
+    product_id = db.Column(db.Integer, db.ForeignKey("productos.id"), primary_key=True)
+    n = db.Column(db.Integer, nullable=False, default=0)
+
+class CoPurchasePair(db.Model):
+    """Cestas que contienen a la vez a y b (a < b)."""
+    __tablename__ = "copurchase_pairs"
+    a = db.Column(db.Integer, primary_key=True)
+    b = db.Column(db.Integer, primary_key=True)
+    n = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.Index("ix_copurchase_pairs_b", "b"),)
+
+class ProductNeighbor(db.Model):
+    """Top-K vecinos por co-compra, ya ordenados (PK product_id, rank)."""
+    __tablename__ = "product_neighbors"
+    product_id = db.Column(db.Integer, db.ForeignKey("productos.id"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey("productos.id"), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+class JobState(db.Model):
+    """Marca de agua de jobs incrementales (p. ej. último order_id procesado)."""
+    __tablename__ = "job_state"
+    name = db.Column(db.String(64), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class PromoCode(db.Model):
     __tablename__ = "promo_codes"
     id = db.Column(db.Integer, primary_key=True)
@@ -122,7 +231,10 @@ class Review(db.Model):
     rating = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.Text, default="")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    __table_args__ = (db.UniqueConstraint("user_id", "product_id", name="uq_review"), )
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "product_id", name="uq_review"),
+        db.Index("ix_reviews_product_id_id", "product_id", "id"),
+    )
 
 class CartItem(db.Model):
     __tablename__ = "cart_items"
@@ -1,5 +1,5 @@
 ﻿from datetime import datetime
-from models import db
+from models import db, UserCard  # user_cards se mapea una sola vez (models.UserCard)
 
 class PackRule(db.Model):
     __tablename__ = "pack_rules"
@@ -20,6 +20,9 @@ class PackAllowance(db.Model):
     last_daily_open_date = db.Column(db.String(10))
     bonus_tokens = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "set_code", name="uq_pack_allowance"),
+    )
 
 class PackOpen(db.Model):
     __tablename__ = "pack_opens"
@@ -27,19 +30,10 @@ class PackOpen(db.Model):
     user_id = db.Column(db.Integer, nullable=False, index=True)
     set_code = db.Column(db.String(32), nullable=False)
     opened_at = db.Column(db.DateTime, default=datetime.utcnow)
-    cards_json = db.Column(db.Text, nullable=False)
-
-class UserCard(db.Model):
-    __tablename__ = "user_cards"
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, nullable=False, index=True)
-    tcg_card_id = db.Column(db.String(80), nullable=False, index=True)
-    set_code = db.Column(db.String(32), nullable=False)
-    name = db.Column(db.String(255), nullable=False)
-    rarity = db.Column(db.String(120))
-    image_url = db.Column(db.Text)
-    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
-    locked = db.Column(db.Boolean, default=False)
+    cards_json = db.Column(db.Text, nullable=False)  # compacto: [[product_id, tier, dup], ...]
+    __table_args__ = (
+        db.Index("ix_pack_opens_user_id_id", "user_id", "id"),
+    )
 
 class StarLedger(db.Model):
     __tablename__ = "star_ledgers"
@@ -48,3 +42,6 @@ class StarLedger(db.Model):
     points = db.Column(db.Integer, nullable=False)
     reason = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index("ix_star_ledgers_user_id_id", "user_id", "id"),
+    )
@@ -1,14 +1,22 @@
 ﻿# packs_bp.py
+import json
 from datetime import date
 
 from flask import (
     Blueprint, render_template, request, session,
-    make_response, redirect, url_for, abort
+    make_response, redirect, url_for, abort, flash, jsonify,
+    Response, stream_with_context
 )
 from flask_login import current_user, login_required
 from sqlalchemy import func, or_
 
 from models import db, PokemonProducto, UserCard
+from models_packs import PackOpen
+from services.packs_service import (
+    consume_pack_allowance, allowance_status, encode_pack_cards,
+    pack_history, iter_pack_history
+)
+from services.points_service import award_points, get_balance, points_history, leaderboard
 
 packs_bp = Blueprint("packs_bp", __name__, url_prefix="/packs")
 
@@ -118,6 +126,10 @@ def packs_home():
     )
     sets = []
     today = date.today().isoformat()
+    status = (
+        allowance_status(current_user.id, [exp for (exp,) in exps], today=today)
+        if current_user.is_authenticated else {}
+    )
     for (exp,) in exps:
         sample = (
             _base_q()
@@ -126,14 +138,16 @@ def packs_home():
             .first()
         )
         img = sample[0] if sample else None
-        sess_key = f"opened:{exp}:{today}"
-        opened_today = session.get(sess_key, False)
+        if current_user.is_authenticated:
+            st = status.get(exp) or {"daily": True, "bonus": 0}
+        else:
+            st = {"daily": not session.get(f"opened:{exp}:{today}", False), "bonus": 0}
         sets.append({
             "set_name": exp,
             "set_code": exp,
             "image": img,
-            "daily": (not opened_today),
-            "bonus": 0,
+            "daily": st["daily"],
+            "bonus": st["bonus"],
         })
     resp = make_response(render_template("packs.html", sets=sets, opened_set=None))
     return _no_store(resp)
@@ -141,14 +155,23 @@ def packs_home():
 @packs_bp.route("/open", methods=["POST", "GET"], endpoint="packs_open")
 def packs_open():
     set_code = request.values.get("set") or ""
-
-    # marca “abierto hoy” (si usas regla de 1 diario)
     today = date.today().isoformat()
+    is_admin = current_user.is_authenticated and getattr(current_user, "is_admin", False)
+
+    # anónimo: la regla de 1 diario solo puede vivir en la sesión
     sess_key = f"opened:{set_code}:{today}"
-    session[sess_key] = True
+    if not current_user.is_authenticated:
+        if session.get(sess_key):
+            flash("Ya abriste el pack diario de este set.", "warning")
+            return _no_store(redirect(url_for("packs_bp.packs_home")))
 
-    # sorteo
+    # sorteo (solo lecturas; el consumo va después para no retener el lock de escritura)
     pack = _draw_random_pack(set_code=set_code)
+    if not pack:
+        flash("No hay cartas disponibles para ese set.", "info")
+        return _no_store(redirect(url_for("packs_bp.packs_home")))
+    if not current_user.is_authenticated:
+        session[sess_key] = True
 
     # dup + persistencia
     dup_points = 0
@@ -157,6 +180,12 @@ def packs_open():
     ids = [int(p.id) for p in pack]
 
     if current_user.is_authenticated:
+        # 1 diario + bonus tokens, consumido con UPDATE condicional (admin ilimitado)
+        if not is_admin and not consume_pack_allowance(current_user.id, set_code, today=today):
+            db.session.rollback()
+            flash("Ya abriste el pack diario de este set y no te quedan bonus tokens.", "warning")
+            return _no_store(redirect(url_for("packs_bp.packs_home")))
+
         # Trae lo que ya tiene el usuario para estos ids
         rows = (
             UserCard.query
@@ -190,6 +219,10 @@ def packs_open():
                 "tcg_card_id": getattr(p, "tcg_card_id", None),
                 "duplicate": already,
             })
+        # puntos por duplicados: libro + saldo en la misma transacción (admin no suma)
+        if dup_points and not is_admin:
+            award_points(current_user.id, dup_points, f"Duplicados {set_code or 'pack'}")
+        db.session.add(PackOpen(user_id=current_user.id, set_code=set_code, cards_json=encode_pack_cards(cards)))
         db.session.commit()
     else:
         # anónimo: usa sesión
@@ -297,6 +330,35 @@ def collection_clear():
     db.session.commit()
     return redirect(url_for("packs_bp.collection"))
 
+@packs_bp.get("/points", endpoint="points_history")
+@login_required
+def points_history_view():
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", 20, type=int)
+    page = points_history(current_user.id, before_id=before, limit=limit)
+    page["balance"] = get_balance(current_user.id)
+    return _no_store(jsonify(page))
+
+@packs_bp.get("/history", endpoint="history")
+@login_required
+def history_view():
+    # ?stream=1 -> NDJSON con todo el historial, servido por lotes
+    if request.args.get("stream"):
+        user_id = current_user.id
+        def gen():
+            for item in iter_pack_history(user_id):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        return _no_store(Response(stream_with_context(gen()), mimetype="application/x-ndjson"))
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", 20, type=int)
+    return _no_store(jsonify(pack_history(current_user.id, before_id=before, limit=limit)))
+
+@packs_bp.get("/leaderboard", endpoint="leaderboard")
+@login_required
+def leaderboard_view():
+    n = request.args.get("n", 10, type=int)
+    return _no_store(jsonify({"items": leaderboard(n, viewer_id=current_user.id)}))
+
 @packs_bp.get("/admin", endpoint="admin_packs")
 def admin_packs():
     if not current_user.is_authenticated:
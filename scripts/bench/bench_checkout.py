@@ -0,0 +1,69 @@
+# scripts/bench/bench_checkout.py
+"""
+Latencia de checkout_cart según tamaño de carrito (1, 10, 50 líneas) sobre un
+SQLite temporal: mide ms por checkout y sentencias SQL emitidas.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.bench.bench_checkout --sizes 1 10 50 --reps 30
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db, User, PokemonProducto
+from scripts.bench.common import make_app, QueryCounter
+from services.checkout_service import checkout_cart
+
+_FILL_SQL = text("""
+    INSERT INTO cart_items(user_id, product_id, quantity, updated_at) VALUES (:u, :p, 1, :ts)
+""")
+
+
+def run(sizes, reps: int) -> list:
+    app = make_app(prefix="checkout_bench_")
+    out = []
+    with app.app_context():
+        u = User(email="bench@example.com")
+        u.set_password("x")
+        u.set_favoritos(["fuego"])
+        db.session.add(u)
+        tipos = ["fuego", "agua", "planta", "eléctrico"]
+        for i in range(max(sizes)):
+            db.session.add(PokemonProducto(
+                nombre=f"Carta {i}", tipo=tipos[i % len(tipos)], categoria="tcg",
+                precio_base=1.0 + i, stock=10 ** 6,
+            ))
+        db.session.commit()
+        user = User.query.first()
+        pids = [p.id for p in PokemonProducto.query.order_by(PokemonProducto.id).all()]
+
+        for size in sizes:
+            times = []; queries = []
+            for _ in range(reps):
+                db.session.execute(_FILL_SQL, [{"u": user.id, "p": pid, "ts": datetime.utcnow()} for pid in pids[:size]])
+                db.session.commit()
+                with QueryCounter(db.engine) as qc:
+                    t0 = time.perf_counter()
+                    res = checkout_cart(user)
+                    times.append((time.perf_counter() - t0) * 1000)
+                assert res["ok"], res
+                queries.append(qc.n)
+            out.append({
+                "cart_size": size,
+                "p50_ms": round(statistics.median(times), 2),
+                "max_ms": round(max(times), 2),
+                "sql_statements": max(queries),
+            })
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="*", default=[1, 10, 50])
+    ap.add_argument("--reps", type=int, default=30)
+    args = ap.parse_args()
+    for row in run(args.sizes, args.reps):
+        print(row)
@@ -0,0 +1,74 @@
+# scripts/bench/bench_market_fetch.py
+"""
+Mide el motor asíncrono de precios contra el mock local: N sets con varias
+páginas cada uno, con el mock limitando a --max-rps (429 + Retry-After).
+Comprueba que llegan todas las cartas de todos los sets. Con --cache hace una
+segunda pasada con caché HTTP: todo debe volver como 304 (sets sin cambios).
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.bench.bench_market_fetch --sets 8 --cards-per-set 600 --rate 40 --max-rps 30
+  python -m scripts.bench.bench_market_fetch --cache
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from scripts.bench.mock_pokemontcg import serve
+from services.http_cache import HttpCache
+from services.market_fetch_async import AsyncMarketFetcher
+
+
+async def _fetch(base: str, set_codes, rate: float, concurrency: int, page_size: int, cache=None):
+    async with AsyncMarketFetcher(api_key="", base_url=base, rate=rate, burst=max(1, int(rate)),
+                                  concurrency=concurrency, max_retry_after=2.0, cache=cache) as f:
+        out = {}
+        async for sc, cards in f.iter_sets(set_codes, page_size=page_size):
+            out[sc] = len(cards)
+        return out, dict(f.stats), set(f.unchanged)
+
+
+def run(sets: int, cards_per_set: int, rate: float, max_rps: float, concurrency: int,
+        latency: float, page_size: int, use_cache: bool = False) -> dict:
+    server, state = serve(0, cards_per_set, max_rps, latency)
+    base = f"http://127.0.0.1:{server.server_address[1]}/v2"
+    codes = [f"bench{i}" for i in range(sets)]
+    cache = HttpCache(tempfile.mkdtemp(prefix="http_cache_bench_")) if use_cache else None
+    t0 = time.perf_counter()
+    counts, stats, _ = asyncio.run(_fetch(base, codes, rate, concurrency, page_size, cache))
+    elapsed = time.perf_counter() - t0
+    res = {
+        "sets": sets,
+        "seconds": round(elapsed, 2),
+        "client": stats,
+        "server_served": state.served,
+        "server_throttled": state.throttled,
+        "complete": all(counts.get(sc) == cards_per_set for sc in codes),
+    }
+    if cache is not None:
+        t0 = time.perf_counter()
+        counts2, stats2, unchanged = asyncio.run(_fetch(base, codes, rate, concurrency, page_size, cache))
+        res.update({
+            "cached_seconds": round(time.perf_counter() - t0, 2),
+            "cached_client": stats2,
+            "complete": res["complete"] and counts2 == counts and unchanged == set(codes),
+        })
+    server.shutdown()
+    return res
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sets", type=int, default=8)
+    ap.add_argument("--cards-per-set", dest="cards_per_set", type=int, default=600)
+    ap.add_argument("--page-size", dest="page_size", type=int, default=250)
+    ap.add_argument("--rate", type=float, default=40.0)
+    ap.add_argument("--max-rps", dest="max_rps", type=float, default=30.0)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--cache", action="store_true", help="Segunda pasada con caché HTTP (304)")
+    args = ap.parse_args()
+    res = run(args.sets, args.cards_per_set, args.rate, args.max_rps, args.concurrency,
+              args.latency, args.page_size, use_cache=args.cache)
+    print(res)
+    raise SystemExit(0 if res["complete"] else 1)
@@ -0,0 +1,39 @@
+# scripts/bench/common.py
+"""App mínima sobre un SQLite temporal en WAL para los benchmarks/stress (no toca store.db)."""
+import os
+import tempfile
+
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, enable_sqlite_wal
+
+
+def make_app(prefix: str = "bench_") -> Flask:
+    db_file = os.path.join(tempfile.mkdtemp(prefix=prefix), "bench.db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        import models_packs  # noqa: F401  (registra las tablas de packs)
+        enable_sqlite_wal(db.engine)
+        db.create_all()
+    return app
+
+
+class QueryCounter:
+    """Cuenta sentencias SQL ejecutadas sobre el engine mientras está activo."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.n = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.n += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
@@ -0,0 +1,120 @@
+# scripts/bench/mock_pokemontcg.py
+"""
+Servidor local que imita GET /v2/cards de pokemontcg.io (q=set.id:XX, page,
+pageSize, totalCount) con precios sintéticos y ETag por página (If-None-Match
+-> 304). Opcionalmente responde 429 con Retry-After cuando se supera
+--max-rps, para probar el rate limiter.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.bench.mock_pokemontcg --port 8765 --cards-per-set 600 --max-rps 20
+  POKEMONTCG_BASE_URL=http://127.0.0.1:8765/v2 python -m scripts.maintenance.update_market_prices_turbo
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class MockState:
+    def __init__(self, cards_per_set: int, max_rps: float, latency: float):
+        self.cards_per_set = cards_per_set
+        self.max_rps = max_rps
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.window = []       # timestamps del último segundo
+        self.served = 0
+        self.throttled = 0
+        self.not_modified = 0
+        self.version = 1       # subirlo simula precios nuevos (cambia el ETag)
+
+    def allow(self) -> bool:
+        if not self.max_rps:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1.0]
+            if len(self.window) >= self.max_rps:
+                self.throttled += 1
+                return False
+            self.window.append(now)
+            return True
+
+    def card(self, set_code: str, n: int) -> dict:
+        price = round(0.1 + (hash((set_code, n)) % 5000) / 100.0, 2)
+        return {"number": str(n), "tcgplayer": {"prices": {"normal": {"market": price}}}}
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code: int, body: dict, headers: dict = None):
+            raw = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not url.path.rstrip("/").endswith("/cards"):
+                return self._send(404, {"error": "not found"})
+            if not state.allow():
+                return self._send(429, {"error": "rate limited"}, {"Retry-After": "1"})
+            if state.latency:
+                time.sleep(state.latency)
+            qs = parse_qs(url.query)
+            m = re.search(r"set\.id:(\S+)", (qs.get("q") or [""])[0])
+            set_code = m.group(1).lower() if m else ""
+            page = int((qs.get("page") or ["1"])[0])
+            size = int((qs.get("pageSize") or ["250"])[0])
+            total = state.cards_per_set if set_code else 0
+            etag = f'"{set_code}-{page}-{size}-{total}-v{state.version}"'
+            if self.headers.get("If-None-Match") == etag:
+                with state.lock:
+                    state.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start = (page - 1) * size
+            data = [state.card(set_code, n) for n in range(start + 1, min(total, start + size) + 1)]
+            with state.lock:
+                state.served += 1
+            self._send(200, {"data": data, "page": page, "pageSize": size, "count": len(data), "totalCount": total},
+                       {"ETag": etag})
+
+    return Handler
+
+
+def serve(port: int = 0, cards_per_set: int = 600, max_rps: float = 0, latency: float = 0.0):
+    """Arranca el mock en un hilo; devuelve (server, state). server.server_address[1] es el puerto."""
+    state = MockState(cards_per_set, max_rps, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--cards-per-set", dest="cards_per_set", type=int, default=600)
+    ap.add_argument("--max-rps", dest="max_rps", type=float, default=0)
+    ap.add_argument("--latency", type=float, default=0.05, help="Segundos por respuesta")
+    args = ap.parse_args()
+    server, _ = serve(args.port, args.cards_per_set, args.max_rps, args.latency)
+    print(f"mock pokemontcg.io en http://127.0.0.1:{server.server_address[1]}/v2")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
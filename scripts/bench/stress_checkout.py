@@ -0,0 +1,106 @@
+# scripts/bench/stress_checkout.py
+"""
+Stress de place_order: N hilos compran a la vez productos con poco stock
+sobre un SQLite temporal en modo WAL. Verifica que nunca se vende más de lo
+que había (sin stock negativo y vendido == stock inicial - stock final) y
+reporta órdenes/segundo.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.bench.stress_checkout --threads 16 --attempts 40 --products 20
+"""
+import argparse
+import random
+import threading
+import time
+
+from sqlalchemy import func
+
+from models import db, User, PokemonProducto, OrderItem
+from scripts.bench.common import make_app
+from services.checkout_service import place_order
+
+
+def seed(n_products: int, n_users: int) -> dict:
+    stock = {}
+    for i in range(n_users):
+        u = User(email=f"stress{i}@example.com")
+        u.set_password("x")
+        db.session.add(u)
+    for i in range(n_products):
+        # la mayoría con stock 1 (cartas limitadas), algunas con algo más
+        st = 1 if i % 4 else 3
+        p = PokemonProducto(nombre=f"Carta {i}", tipo="fuego", categoria="tcg", precio_base=1.0 + i, stock=st)
+        db.session.add(p)
+        db.session.flush()
+        stock[p.id] = st
+    db.session.commit()
+    return stock
+
+
+def run(threads: int, attempts: int, n_products: int, max_lines: int = 3) -> dict:
+    app = make_app(prefix="checkout_stress_")
+    with app.app_context():
+        initial = seed(n_products, threads)
+        user_ids = [u.id for u in User.query.order_by(User.id).all()]
+    pids = sorted(initial)
+
+    placed = {"ok": 0, "short": 0}
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(idx: int):
+        rng = random.Random(idx)
+        with app.app_context():
+            barrier.wait()
+            for _ in range(attempts):
+                picks = rng.sample(pids, rng.randint(1, max_lines))
+                lines = [{"product_id": pid, "name": f"Carta {pid}", "qty": 1, "unit_price": 1.0} for pid in picks]
+                try:
+                    res = place_order(user_ids[idx], lines)
+                except Exception as e:
+                    with lock:
+                        errors.append(repr(e))
+                    continue
+                with lock:
+                    placed["ok" if res["ok"] else "short"] += 1
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    with app.app_context():
+        final = dict(db.session.query(PokemonProducto.id, PokemonProducto.stock).all())
+        sold = dict(
+            db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .group_by(OrderItem.product_id).all()
+        )
+    oversold = [
+        pid for pid in pids
+        if final[pid] < 0 or int(sold.get(pid, 0)) != initial[pid] - final[pid] or int(sold.get(pid, 0)) > initial[pid]
+    ]
+    return {
+        "attempts": threads * attempts,
+        "orders": placed["ok"],
+        "rejected_no_stock": placed["short"],
+        "errors": len(errors),
+        "oversold_products": len(oversold),
+        "ok": not oversold and not errors,
+        "orders_per_s": round(placed["ok"] / elapsed, 1) if elapsed else None,
+        "attempts_per_s": round(threads * attempts / elapsed, 1) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--attempts", type=int, default=40)
+    ap.add_argument("--products", type=int, default=20)
+    args = ap.parse_args()
+    res = run(args.threads, args.attempts, args.products)
+    print(res)
+    raise SystemExit(0 if res["ok"] else 1)
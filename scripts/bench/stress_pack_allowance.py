@@ -0,0 +1,80 @@
+# scripts/bench/stress_pack_allowance.py
+"""
+Stress de consume_pack_allowance: N hilos intentan abrir packs del mismo set
+para el mismo usuario sobre un SQLite temporal en modo WAL. Con 1 diario y
+B bonus tokens deben concederse exactamente 1 + B packs.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.bench.stress_pack_allowance --threads 16 --attempts 50 --bonus 5
+"""
+import argparse
+import threading
+import time
+
+
+from models import db
+from models_packs import PackAllowance
+from scripts.bench.common import make_app
+from services.packs_service import consume_pack_allowance, today_str
+
+
+def run(threads: int, attempts: int, bonus: int, user_id: int = 1, set_code: str = "sv1") -> dict:
+    app = make_app(prefix="pack_stress_")
+    with app.app_context():
+        db.session.add(PackAllowance(user_id=user_id, set_code=set_code, bonus_tokens=bonus))
+        db.session.commit()
+
+    today = today_str()
+    granted = {"daily": 0, "bonus": 0}
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        with app.app_context():
+            barrier.wait()
+            for _ in range(attempts):
+                try:
+                    kind = consume_pack_allowance(user_id, set_code, today=today)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(repr(e))
+                    continue
+                if kind:
+                    with lock:
+                        granted[kind] += 1
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    with app.app_context():
+        left = db.session.query(PackAllowance.bonus_tokens).filter_by(user_id=user_id, set_code=set_code).scalar()
+
+    total = threads * attempts
+    return {
+        "attempts": total,
+        "granted_daily": granted["daily"],
+        "granted_bonus": granted["bonus"],
+        "bonus_left": left,
+        "errors": len(errors),
+        "ok": granted["daily"] == 1 and granted["bonus"] == bonus and left == 0 and not errors,
+        "ops_per_s": round(total / elapsed, 1) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--attempts", type=int, default=50)
+    ap.add_argument("--bonus", type=int, default=5)
+    args = ap.parse_args()
+    res = run(args.threads, args.attempts, args.bonus)
+    print(res)
+    raise SystemExit(0 if res["ok"] else 1)
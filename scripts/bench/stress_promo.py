@@ -0,0 +1,68 @@
+# scripts/bench/stress_promo.py
+"""
+Stress de canje de cupones: N hilos hacen checkout a la vez con el mismo
+cupón max_uses=1; debe canjearse exactamente una vez.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.bench.stress_promo --threads 32 --max-uses 1
+"""
+import argparse
+import threading
+
+from models import db, User, PokemonProducto, PromoCode
+from scripts.bench.common import make_app
+from services.checkout_service import place_order
+from services.promo_service import invalidate_promo_cache
+
+
+def run(threads: int, max_uses: int) -> dict:
+    app = make_app(prefix="promo_stress_")
+    with app.app_context():
+        for i in range(threads):
+            u = User(email=f"promo{i}@example.com")
+            u.set_password("x")
+            db.session.add(u)
+        p = PokemonProducto(nombre="Sobre", tipo="normal", categoria="sellado", precio_base=10.0, stock=10 ** 6)
+        db.session.add(p)
+        db.session.add(PromoCode(code="PIKA10", percent=10, max_uses=max_uses, used_count=0))
+        db.session.commit()
+        user_ids = [u.id for u in User.query.order_by(User.id).all()]
+        pid = p.id
+    invalidate_promo_cache()
+
+    results = {"ok": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(idx: int):
+        with app.app_context():
+            barrier.wait()
+            try:
+                res = place_order(user_ids[idx], [{"product_id": pid, "name": "Sobre", "qty": 1, "unit_price": 10.0}],
+                                  promo_code="PIKA10")
+                key = "ok" if res["ok"] else "rejected"
+            except Exception:
+                key = "errors"
+            with lock:
+                results[key] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    with app.app_context():
+        used = db.session.query(PromoCode.used_count).filter_by(code="PIKA10").scalar()
+    results.update({"used_count": used, "ok_exactly_max": results["ok"] == max_uses == used})
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--max-uses", dest="max_uses", type=int, default=1)
+    args = ap.parse_args()
+    res = run(args.threads, args.max_uses)
+    print(res)
+    raise SystemExit(0 if res["ok_exactly_max"] else 1)
@@ -0,0 +1,73 @@
+# scripts/bench/stress_view_events.py
+"""
+Stress de la ingesta de vistas: N hilos registran vistas a la vez; al parar
+la cola, escritas + descartadas debe ser igual a enviadas y record() no debe
+bloquear (se mide el tiempo medio por llamada).
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.bench.stress_view_events --threads 16 --events 2000 --maxsize 10000
+"""
+import argparse
+import threading
+import time
+
+from sqlalchemy import text
+
+from models import db, User, PokemonProducto
+from scripts.bench.common import make_app
+from services.view_events_service import ViewEventQueue
+
+
+def run(threads: int, events: int, maxsize: int) -> dict:
+    app = make_app(prefix="views_stress_")
+    with app.app_context():
+        u = User(email="views@example.com")
+        u.set_password("x")
+        db.session.add(u)
+        p = PokemonProducto(nombre="Carta", tipo="normal", categoria="tcg", precio_base=1.0, stock=1)
+        db.session.add(p)
+        db.session.commit()
+        uid, pid = u.id, p.id
+        sink = ViewEventQueue(db.engine, batch_size=200, flush_ms=50, maxsize=maxsize).start()
+
+    elapsed = [0.0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        t0 = time.perf_counter()
+        for _ in range(events):
+            sink.record(uid, pid)
+        with lock:
+            elapsed[0] += time.perf_counter() - t0
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    sink.stop()
+
+    with app.app_context():
+        rows = db.session.execute(text("SELECT COUNT(*) FROM product_views")).scalar()
+    stats = sink.stats()
+    sent = threads * events
+    stats.update({
+        "sent": sent,
+        "rows": rows,
+        "us_per_record": round(elapsed[0] / sent * 1e6, 2),
+        "consistent": rows == stats["written"] and stats["written"] + stats["dropped"] + stats["failed"] == sent,
+    })
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--events", type=int, default=2000)
+    ap.add_argument("--maxsize", type=int, default=10000)
+    args = ap.parse_args()
+    res = run(args.threads, args.events, args.maxsize)
+    print(res)
+    raise SystemExit(0 if res["consistent"] else 1)
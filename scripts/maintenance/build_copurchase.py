@@ -0,0 +1,28 @@
+# scripts/maintenance/build_copurchase.py
+"""
+Recomendador "también compraron": suma los pedidos nuevos desde la última
+ejecución y recalcula los vecinos afectados. --full lo reconstruye desde
+todos los pedidos más las colecciones (user_cards); el modo incremental no ve
+los cambios de colección, así que --full debe programarse periódicamente.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.maintenance.build_copurchase
+  python -m scripts.maintenance.build_copurchase --full --k 10 --metric jaccard
+"""
+import argparse
+from app import create_app
+from services.copurchase_service import update, TOP_K
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="Reconstrucción completa (única que incluye user_cards).")
+    ap.add_argument("--k", type=int, default=TOP_K, help="Vecinos guardados por producto.")
+    ap.add_argument("--metric", choices=("cosine", "jaccard"), default="cosine")
+    args = ap.parse_args()
+    app = create_app()
+    with app.app_context():
+        out = update(full=args.full, k=args.k, metric=args.metric)
+        print(", ".join(f"{k}={v}" for k, v in out.items()))
+
+if __name__ == "__main__":
+    main()
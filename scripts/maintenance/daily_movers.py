@@ -0,0 +1,37 @@
+# scripts/maintenance/daily_movers.py
+"""
+Mayores subidas y bajadas de precio de mercado del catálogo en las últimas
+horas, en una sola pasada por price_history. --prune aplica además la
+retención (detalle 30 días, un punto diario hasta 365).
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.maintenance.daily_movers
+  python -m scripts.maintenance.daily_movers --hours 168 --limit 10 --min-price 1
+  python -m scripts.maintenance.daily_movers --prune
+"""
+import argparse
+from app import create_app
+from services.price_history_service import daily_movers, prune_history
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hours", type=int, default=24)
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--min-price", dest="min_price", type=float, default=0.0, help="Ignora cartas más baratas (ruido)")
+    ap.add_argument("--prune", action="store_true", help="Aplica la retención del historial antes de calcular")
+    ap.add_argument("--full-days", dest="full_days", type=int, default=30)
+    ap.add_argument("--keep-days", dest="keep_days", type=int, default=365)
+    args = ap.parse_args()
+    app = create_app()
+    with app.app_context():
+        if args.prune:
+            print("Retención: " + ", ".join(f"{k}={v}" for k, v in prune_history(args.full_days, args.keep_days).items()))
+        res = daily_movers(hours=args.hours, limit=args.limit, min_price=args.min_price)
+        for title, key in (("Suben", "gainers"), ("Bajan", "losers")):
+            print(f"\n{title}:")
+            for m in res[key]:
+                print(f"  {m['change_pct']:+7.2f}%  {m['from']:.2f} -> {m['to']:.2f} {m['currency'] or ''}  "
+                      f"[{m['product_id']}] {m['nombre']}")
+
+if __name__ == "__main__":
+    main()
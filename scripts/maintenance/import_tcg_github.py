@@ -3,142 +3,121 @@
 Importa cartas TCG desde el repo publico:
   https://github.com/PokemonTCG/pokemon-tcg-data
 
-Descarga cards/en/{set}.json y toma el nombre del set desde sets/en.json (indice global).
+Lee cards/en/{set}.json y toma el nombre del set desde sets/en.json (indice global).
+El origen (services.tcg_sources) puede ser GitHub (por defecto), un clon local
+del repo o su tarball (--source o TCG_DATA_SOURCE); los locales se leen en
+streaming, sin red. Desde GitHub los sets se bajan en paralelo (--workers).
+Las cartas se insertan en bloque (services.tcg_import_service); --update
+refresca imagen, rareza, nombre, etc. de las cartas que ya existen.
+--diff compara cada set con la base por hash de contenido y aplica altas,
+cambios y bajas; FTS y embeddings se rehacen solo para las filas tocadas
+(--dry-run solo informa).
 
 Uso (desde la raiz del proyecto):
   python -m scripts.maintenance.import_tcg_github --sets sv1 sv2 swsh7
+  python -m scripts.maintenance.import_tcg_github --all --workers 16
+  python -m scripts.maintenance.import_tcg_github --all --source ../pokemon-tcg-data
+  python -m scripts.maintenance.import_tcg_github --all --source pokemon-tcg-data-master.tar.gz
+  python -m scripts.maintenance.import_tcg_github --sets sv1 --update
+  python -m scripts.maintenance.import_tcg_github --all --diff --dry-run
 """
 import argparse
 import time
-import random
-import requests
 
 from app import create_app
-from models import db, PokemonProducto
-
-RAW_BASE = "https://raw.githubusercontent.com/PokemonTCG/pokemon-tcg-data/master"
-
-TYPE_MAP = {
-    "Fire":"fuego","Water":"agua","Lightning":"eléctrico","Grass":"planta",
-    "Dragon":"dragón","Psychic":"psíquico","Darkness":"siniestro","Fighting":"lucha",
-    "Metal":"acero","Colorless":"incoloro","Fairy":"hada","Ice":"hielo","Rock":"roca",
-}
-
-SETS_INDEX_CACHE = None
-
-def fetch_json(url: str):
-    try:
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        return r.json()
-    except Exception as e:
-        print("[fetch] {} -> {}".format(url, e))
-        return None
-
-def get_sets_index() -> dict:
-    """Devuelve dict { set_id_lower: set_name } usando sets/en.json."""
-    global SETS_INDEX_CACHE
-    if SETS_INDEX_CACHE is not None:
-        return SETS_INDEX_CACHE
-    url = "{}/sets/en.json".format(RAW_BASE)
-    data = fetch_json(url) or []
-    idx = {}
-    for s in data:
-        sid = (s.get("id") or "").lower()
-        name = s.get("name") or sid.upper()
-        if sid:
-            idx[sid] = name
-    SETS_INDEX_CACHE = idx
-    return idx
-
-def load_set_cards(set_code: str):
-    """Carga las cartas del set y obtiene el nombre desde el indice global."""
-    idx = get_sets_index()
-    set_name = idx.get(set_code.lower(), set_code.upper())
-    cards_url = "{}/cards/en/{}.json".format(RAW_BASE, set_code)
-    cards = fetch_json(cards_url) or []
-    if not isinstance(cards, list):
-        cards = []
-    print("Set {}: {} cartas, nombre: {}".format(set_code, len(cards), set_name))
-    return cards, set_name
-
-def extract_price(c: dict) -> float:
-    price = 9.99
-    tp = c.get("tcgplayer") or {}
-    prices = tp.get("prices") or {}
-    for k in ["holofoil","reverseHolofoil","normal","1stEditionHolofoil","unlimitedHolofoil","rareHoloEX"]:
-        p = prices.get(k) or {}
-        if "market" in p and p["market"]:
-            try:
-                price = max(2.99, float(p["market"]))
-                break
-            except Exception:
-                pass
-    return round(price, 2)
-
-def upsert_card(c: dict, set_name: str) -> bool:
-    tid = c.get("id")  # ej: "sv2-12"
-    if not tid:
-        return False
-
-    # evita duplicados por id real de carta
-    if PokemonProducto.query.filter_by(tcg_card_id=tid).first():
-        return False
-
-    name = c.get("name","").strip()
-    number = c.get("number","")
-    total = c.get("setTotal") or "?"
-    card_number = "{}/{}".format(number, total)
-
-    tipos = c.get("types") or ["Colorless"]
-    tipo_api = tipos[0] if tipos else "Colorless"
-    tipo = TYPE_MAP.get(tipo_api, "incoloro")
-
-    imgs = c.get("images") or {}
-    img = imgs.get("large") or imgs.get("small")
-
-    rarity = c.get("rarity") or ""
-    expansion = set_name
-    language = "EN"
-    condition = "NM"
-
-    price = extract_price(c)
-    stock = random.randint(1, 20)
-
-    payload = dict(
-        nombre="{} - {} {}".format(name, set_name, card_number),
-        tipo=tipo, categoria="tcg",
-        precio_base=price, stock=stock,
-        image_url=img,
-        # descripcion sin caracteres especiales para evitar mojibake en el .py
-        descripcion="Carta TCG - Expansion: {} - Rareza: {} - Idioma: {} - Nro: {}".format(
-            expansion, rarity, language, card_number
-        ),
-        expansion=expansion, rarity=rarity, language=language,
-        condition=condition, card_number=card_number,
-        tcg_card_id=tid,
-    )
-
-    p = PokemonProducto(**payload)  # IMPORTANT: kwargs
-    db.session.add(p)
-    return True
+from services.tcg_import_service import (
+    apply_diff, card_row, diff_set, ensure_unique_index, existing_tcg_ids, fetch_parallel,
+    import_rows, reembed_products,
+)
+from services.tcg_sources import open_source
+
+BATCH = 500  # filas por executemany/commit (acota la memoria con sets grandes)
+
+def iter_remote(source, codes, workers: int):
+    """GitHub: descargas en paralelo, cada set completo en memoria (es un solo GET)."""
+    idx = source.sets_index()  # antes de los hilos
+    def load(code):
+        return list(source.iter_cards(code)), idx.get(code.lower(), code.upper())
+    for code, cards, set_name in fetch_parallel(codes, load, workers=workers):
+        yield code, iter(cards), set_name
+
+def iter_local(source, codes):
+    idx = source.sets_index()
+    for code, cards in source.iter_sets(codes):
+        yield code, cards, idx.get(code.lower(), code.upper())
+
+def run_diff(sets, dry_run: bool = False, embeddings: bool = True):
+    """Diff por set (el set entero en memoria: hace falta para detectar bajas)."""
+    tot = {"insert": 0, "update": 0, "delete": 0, "retired": 0, "restored": 0, "embedded": 0}
+    t0 = time.time()
+    for code, cards, set_name in sets:
+        rows = [r for r in (card_row(c, set_name) for c in cards) if r]
+        diff = diff_set(code, rows)
+        for k in ("insert", "update", "delete"):
+            tot[k] += len(diff[k])
+        sample = ", ".join(r["tcg_card_id"] for r in diff["update"][:5])
+        print("Set {}: {} cartas -> +{} ~{} -{}{}".format(
+            code, len(rows), len(diff["insert"]), len(diff["update"]), len(diff["delete"]),
+            " (cambios: {}{})".format(sample, "..." if len(diff["update"]) > 5 else "") if sample else ""))
+        if dry_run or not any(diff.values()):
+            continue
+        res = apply_diff(diff)
+        tot["retired"] += res["retired"]
+        tot["restored"] += res["restored"]
+        if embeddings:
+            tot["embedded"] += reembed_products(res["changed_ids"])
+    print("Diff {}: altas {}, cambios {} (recuperadas: {}), bajas {} (retiradas con historial: {}), "
+          "embeddings {} ({:.1f}s)".format(
+        "simulado" if dry_run else "aplicado", tot["insert"], tot["update"], tot["restored"], tot["delete"],
+        tot["retired"], tot["embedded"], time.time() - t0))
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--sets", nargs="*", required=True, help="Codigos de set: sv1 sv2 sv3 sv4 swsh7 ...")
+    ap.add_argument("--sets", nargs="*", default=[], help="Codigos de set: sv1 sv2 sv3 sv4 swsh7 ...")
+    ap.add_argument("--all", action="store_true", help="Todos los sets del origen")
+    ap.add_argument("--source", default=None, help="Clon local o tarball de pokemon-tcg-data (por defecto GitHub)")
+    ap.add_argument("--workers", type=int, default=8, help="Descargas en paralelo (solo GitHub)")
+    ap.add_argument("--update", action="store_true", help="Refresca los campos del upstream de las cartas existentes")
+    ap.add_argument("--diff", action="store_true", help="Altas, cambios y bajas por set según el hash de contenido")
+    ap.add_argument("--dry-run", dest="dry_run", action="store_true", help="Con --diff: solo informa, no escribe")
+    ap.add_argument("--no-embeddings", dest="no_embeddings", action="store_true",
+                    help="Con --diff: no recalcula embeddings de las filas cambiadas")
     args = ap.parse_args()
+    if not args.sets and not args.all:
+        ap.error("indica --sets o --all")
+    if args.dry_run and not args.diff:
+        ap.error("--dry-run solo aplica con --diff")
 
+    source = open_source(args.source)
     app = create_app()
-    added = 0
+    added = updated = 0
+    t0 = time.time()
     with app.app_context():
-        for code in args.sets:
-            cards, set_name = load_set_cards(code)
+        ensure_unique_index()
+        codes = source.set_ids() if args.all else args.sets
+        existing = existing_tcg_ids()
+        sets = iter_remote(source, codes, args.workers) if source.remote else iter_local(source, codes)
+        if args.diff:
+            run_diff(sets, dry_run=args.dry_run, embeddings=not args.no_embeddings)
+            return
+        for code, cards, set_name in sets:
+            n = a = u = 0
+            rows = []
             for c in cards:
-                if upsert_card(c, set_name):
-                    added += 1
-            db.session.commit()
-            time.sleep(0.5)
-    print("Import completado. Cartas agregadas: {}".format(added))
+                n += 1
+                r = card_row(c, set_name)
+                if r:
+                    rows.append(r)
+                if len(rows) >= BATCH:
+                    a2, u2 = import_rows(rows, existing, update=args.update)
+                    a, u, rows = a + a2, u + u2, []
+            a2, u2 = import_rows(rows, existing, update=args.update)
+            a, u = a + a2, u + u2
+            added += a
+            updated += u
+            print("Set {}: {} cartas, nombre: {} (+{} nuevas, {} actualizadas)".format(code, n, set_name, a, u))
+    print("Import completado ({}). Cartas agregadas: {}, actualizadas: {} ({:.1f}s)".format(
+        source, added, updated, time.time() - t0))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
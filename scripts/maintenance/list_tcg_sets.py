@@ -8,42 +8,15 @@ Uso (desde la raíz del proyecto):
   python -m scripts.maintenance.list_tcg_sets --import-cmd
   # Filtro por prefijo (opcional): sv, swsh, base, xy, etc.
   python -m scripts.maintenance.list_tcg_sets --only-new --prefix sv
+  # Sin red, desde un clon local o el tarball de pokemon-tcg-data
+  python -m scripts.maintenance.list_tcg_sets --only-new --source ../pokemon-tcg-data
 """
 
 import argparse
-import requests
 
 from app import create_app
 from models import db, PokemonProducto
-
-RAW_BASE = "https://raw.githubusercontent.com/PokemonTCG/pokemon-tcg-data/master"
-GH_CARDS_EN = "https://api.github.com/repos/PokemonTCG/pokemon-tcg-data/contents/cards/en"
-
-def fetch_cards_dir_ids():
-    """Devuelve ids de sets según los filenames cards/en/*.json (sin extensión)."""
-    r = requests.get(GH_CARDS_EN, headers={"User-Agent":"PokeShop/sets-lister"}, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-    ids = []
-    for entry in data:
-        name = entry.get("name","")
-        if name.endswith(".json"):
-            ids.append(name[:-5])  # sin .json
-    return sorted(ids)
-
-def fetch_sets_index():
-    """Devuelve dict { set_id_lower: set_name } usando sets/en.json."""
-    url = f"{RAW_BASE}/sets/en.json"
-    r = requests.get(url, headers={"User-Agent":"PokeShop/sets-lister"}, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-    idx = {}
-    for s in data:
-        sid = (s.get("id") or "").lower()
-        name = s.get("name") or sid.upper()
-        if sid:
-            idx[sid] = name
-    return idx
+from services.tcg_sources import open_source
 
 def existing_set_prefixes_in_db() -> set[str]:
     """Extrae prefijos de set desde tcg_card_id (antes del '-') de productos existentes."""
@@ -70,21 +43,23 @@ def main():
     ap.add_argument("--limit", type=int, default=0, help="Limita la cantidad impresa (solo para --only-new).")
     ap.add_argument("--import-cmd", action="store_true", help="Imprime el/los comandos de importación para los 'restantes'.")
     ap.add_argument("--prefix", type=str, default="", help="Filtra por prefijo (sv, swsh, base, xy, etc.).")
+    ap.add_argument("--source", type=str, default=None, help="Clon local o tarball de pokemon-tcg-data (por defecto GitHub).")
     args = ap.parse_args()
 
     app = create_app()
     with app.app_context():
-        cards_ids = fetch_cards_dir_ids()            # p.ej. ['sv1','sv2','sv3','swsh7','zsv10pt5',...]
+        source = open_source(args.source)
+        cards_ids = source.set_ids()                 # p.ej. ['sv1','sv2','sv3','swsh7','zsv10pt5',...]
         if args.prefix:
             cards_ids = [sid for sid in cards_ids if sid.lower().startswith(args.prefix.lower())]
 
-        idx_names = fetch_sets_index()               # mapea a nombres bonitos si existen
+        idx_names = source.sets_index()              # mapea a nombres bonitos si existen
         exist_prefixes = existing_set_prefixes_in_db()
 
         enriched = [(sid, idx_names.get(sid.lower(), sid.upper())) for sid in cards_ids]
 
         if args.show_all and not args.only_new:
-            print("Sets disponibles (según GitHub cards/en/*.json):")
+            print(f"Sets disponibles (según cards/en/*.json de {source}):")
             for sid, name in enriched:
                 print(f"{sid}\t{name}")
             print(f"\nTotal: {len(enriched)}")
@@ -110,7 +85,8 @@ def main():
                 chunk = 20
                 for i in range(0, len(remaining), chunk):
                     ids_chunk = " ".join(sid for sid, _ in remaining[i:i+chunk])
-                    print(f"python -m scripts.maintenance.import_tcg_github --sets {ids_chunk}")
+                    src = f" --source {args.source}" if args.source else ""
+                    print(f"python -m scripts.maintenance.import_tcg_github --sets {ids_chunk}{src}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,20 @@
+# scripts/maintenance/rebuild_top_sellers.py
+"""
+Reconstruye product_sales desde order_items y los rankings de top_sellers
+(tipo / expansión / set). El checkout ya los mantiene al día; esto es para
+la carga inicial o si algún refresco post-checkout falló.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.maintenance.rebuild_top_sellers
+"""
+from app import create_app
+from services.top_sellers_service import rebuild_all
+
+def main():
+    app = create_app()
+    with app.app_context():
+        out = rebuild_all()
+        print("Filas de ranking por scope: " + ", ".join(f"{k}={v}" for k, v in out.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# scripts/maintenance/reconcile_star_points.py
+"""
+Recalcula users.star_points desde star_ledgers (en bloque) y reporta los
+saldos que estaban desalineados.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.maintenance.reconcile_star_points --dry-run
+  python -m scripts.maintenance.reconcile_star_points
+"""
+import argparse
+from app import create_app
+from services.points_service import reconcile_balances
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true", help="Solo cuenta usuarios desalineados, no escribe.")
+    args = ap.parse_args()
+    app = create_app()
+    with app.app_context():
+        n = reconcile_balances(dry_run=args.dry_run)
+        print(f"Saldos desalineados: {n}" + (" (sim)" if args.dry_run else " (corregidos)"))
+
+if __name__ == "__main__":
+    main()
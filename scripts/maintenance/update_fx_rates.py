@@ -0,0 +1,30 @@
+# scripts/maintenance/update_fx_rates.py
+"""
+Carga las tasas de cambio desde el archivo local (data/fx_rates.json o
+FX_RATES_FILE) en la tabla fx_rates y recalcula market_price_norm de todo el
+catálogo. Correr tras editar el archivo de tasas.
+
+Uso (desde la raíz del proyecto):
+  python -m scripts.maintenance.update_fx_rates
+  python -m scripts.maintenance.update_fx_rates --file otro_rates.json
+"""
+import argparse
+from app import create_app
+from models import db
+from services.fx_service import STORE_CURRENCY, load_rates_file, save_rates, renormalize_all
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--file", default=None, help="Archivo de tasas (por defecto data/fx_rates.json)")
+    args = ap.parse_args()
+    app = create_app()
+    with app.app_context():
+        rates = load_rates_file(args.file)
+        save_rates(rates, source=args.file or "data/fx_rates.json")
+        n = renormalize_all()
+        db.session.commit()
+        print(f"{len(rates)} tasas a {STORE_CURRENCY}: " + ", ".join(f"{c}={r:.4f}" for c, r in sorted(rates.items())))
+        print(f"{n} precios de mercado renormalizados")
+
+if __name__ == "__main__":
+    main()
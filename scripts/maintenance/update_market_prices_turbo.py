@@ -1,28 +1,67 @@
 ﻿import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from sqlalchemy import text
+import asyncio
+from sqlalchemy import text, bindparam, DateTime
 from models import db
 try:
     from app import create_app
 except Exception:
     create_app = None
-from services.market_price_service import MarketPriceService
-from typing import List, Optional, Tuple
+from services.market_price_service import MarketPriceService, PriceWriter, stale_cutoff
+from services.market_fetch_async import AsyncMarketFetcher
+from services.http_cache import default_cache
+from typing import List, Optional
 
-def list_set_codes() -> List[str]:
+def list_set_codes(max_age_days: int = 0) -> List[str]:
+    """Sets con alguna carta vencida (market_updated_at nulo o más viejo que max_age_days)."""
+    cutoff = stale_cutoff(max_age_days or None)
     rows = db.session.execute(text("""
         SELECT DISTINCT lower(substr(tcg_card_id,1,instr(tcg_card_id,'-')-1)) AS set_code
         FROM productos
         WHERE categoria='tcg' AND tcg_card_id IS NOT NULL AND tcg_card_id<>'' AND instr(tcg_card_id,'-')>0
-    """)).fetchall()
+          AND (:cutoff IS NULL OR market_updated_at IS NULL OR market_updated_at < :cutoff)
+    """).bindparams(bindparam("cutoff", type_=DateTime)), {"cutoff": cutoff}).fetchall()
     return [r[0] for r in rows if r and r[0]]
 
-def update_one_set(sc: str, sleep: float, max_age_days: int) -> Tuple[str,int]:
+async def _fetch_and_apply(set_codes: List[str], max_age_days: int, rate: float, concurrency: int,
+                           use_cache: bool = True) -> int:
+    """
+    Descarga todos los sets en paralelo (bucket y pool compartidos); al
+    terminar cada set calcula sus cambios y los encola al escritor único, así
+    la descarga sigue mientras se escribe. Con caché, los sets sin cambios
+    (304) no se vuelven a bajar, pero su cuerpo cacheado se compara igual
+    con la DB: un 304 no garantiza que la DB ya tenga esos precios. El
+    escritor se cierra siempre (finally): lo ya encolado se escribe aunque
+    el job termine con error.
+    """
     svc = MarketPriceService()
-    n = svc.update_prices_by_set(sc, sleep=sleep, max_age_days=(max_age_days or None))
-    return sc, n
+    writer = PriceWriter(db.engine)
+    cache = default_cache() if use_cache else None
+    try:
+        async with AsyncMarketFetcher(rate=rate, burst=max(1, int(rate)), concurrency=concurrency,
+                                      cache=cache) as fetcher:
+            async for sc, cards in fetcher.iter_sets(set_codes):
+                if sc in fetcher.errors:
+                    print(f"[ERR] fetch {sc}: {fetcher.errors[sc]}")
+                try:
+                    rows = svc.price_changes(sc, cards, max_age_days=(max_age_days or None),
+                                             complete=sc not in fetcher.incomplete)
+                    db.session.rollback()  # suelta el snapshot de lectura
+                    writer.submit(sc, rows)
+                    note = " (304, desde caché)" if sc in fetcher.unchanged else ""
+                    if sc in fetcher.incomplete:
+                        note += " (incompleto: sin renovar frescura de las ausentes)"
+                    print(f"[{sc}] cards: {len(cards)} rows to write: {len(rows)}{note}")
+                except Exception as e:
+                    print(f"[ERR] {sc}: {e}")
+            print(f"HTTP: {fetcher.stats}")
+    finally:
+        total = writer.close()
+        for err in writer.errors:
+            print(f"[ERR] write {err}")
+    return total
 
-def run(set_codes: Optional[List[str]], workers: int = 4, sleep: float = 0.0, max_age_days: int = 7):
+def run(set_codes: Optional[List[str]], concurrency: int = 8, rate: float = 10.0, max_age_days: int = 7,
+        use_cache: bool = True):
     app = None
     if create_app:
         try: app = create_app()
@@ -39,16 +78,9 @@ def run(set_codes: Optional[List[str]], workers: int = 4, sleep: float = 0.0, ma
     total = 0
     with app.app_context():
         if not set_codes:
-            set_codes = list_set_codes()
-        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
-            futs = [ex.submit(update_one_set, sc, sleep, max_age_days) for sc in set_codes]
-            for f in as_completed(futs):
-                try:
-                    sc, n = f.result()
-                    print(f"[{sc}] updated: {n}")
-                    total += n
-                except Exception as e:
-                    print(f"[ERR] {e}")
+            set_codes = list_set_codes(max_age_days)
+            print(f"Sets con precios vencidos: {len(set_codes)}")
+        total = asyncio.run(_fetch_and_apply(set_codes, max_age_days, rate, concurrency, use_cache))
         print(f"Total updated: {total}")
         return total
 
@@ -56,9 +88,11 @@ if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser()
     ap.add_argument("--set", dest="set_code", default=None, help="sv1,sv2 (comma separated)")
-    ap.add_argument("--workers", type=int, default=4)
-    ap.add_argument("--sleep", type=float, default=0.0)
+    ap.add_argument("--concurrency", type=int, default=8, help="Peticiones HTTP simultáneas")
+    ap.add_argument("--rate", type=float, default=10.0, help="Peticiones/s (bucket global)")
     ap.add_argument("--max-age", dest="max_age", type=int, default=7)
+    ap.add_argument("--no-cache", dest="no_cache", action="store_true", help="Ignora la caché HTTP (baja todo)")
     args = ap.parse_args()
     sets = [s.strip().lower() for s in (args.set_code or "").split(",") if s.strip()] if args.set_code else None
-    run(sets, workers=args.workers, sleep=args.sleep, max_age_days=args.max_age)
+    run(sets, concurrency=args.concurrency, rate=args.rate, max_age_days=args.max_age,
+        use_cache=not args.no_cache)
@@ -0,0 +1,59 @@
+# scripts/migrations/upgrade_v15_pack_allowance.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    # WAL es persistente en el fichero: basta con activarlo una vez
+    mode = db.session.execute(text("PRAGMA journal_mode=WAL")).scalar()
+    print(f"v15: journal_mode={mode}")
+
+    row = db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='pack_allowances'"
+    )).fetchone()
+    if not row:
+        print("v15: pack_allowances no existe (ejecuta upgrade_v12 primero)")
+    else:
+        # Fusiona duplicados (user_id, set_code): conserva la fila más antigua,
+        # la fecha diaria más reciente y la suma de bonus tokens
+        db.session.execute(text("""
+            UPDATE pack_allowances SET
+              last_daily_open_date = (
+                SELECT MAX(b.last_daily_open_date) FROM pack_allowances b
+                WHERE b.user_id = pack_allowances.user_id AND b.set_code = pack_allowances.set_code),
+              bonus_tokens = (
+                SELECT SUM(b.bonus_tokens) FROM pack_allowances b
+                WHERE b.user_id = pack_allowances.user_id AND b.set_code = pack_allowances.set_code)
+            WHERE id IN (
+              SELECT MIN(id) FROM pack_allowances GROUP BY user_id, set_code HAVING COUNT(*) > 1)
+        """))
+        res = db.session.execute(text("""
+            DELETE FROM pack_allowances
+            WHERE id NOT IN (SELECT MIN(id) FROM pack_allowances GROUP BY user_id, set_code)
+        """))
+        db.session.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_pack_allowance ON pack_allowances(user_id, set_code)"
+        ))
+        db.session.commit()
+        print(f"v15: uq_pack_allowance lista (duplicados eliminados: {res.rowcount})")
@@ -0,0 +1,52 @@
+# scripts/migrations/upgrade_v16_star_points.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    cols = [r[1] for r in db.session.execute(text("PRAGMA table_info(users)")).fetchall()]
+    if "star_points" not in cols:
+        db.session.execute(text("ALTER TABLE users ADD COLUMN star_points INTEGER NOT NULL DEFAULT 0"))
+    db.session.execute(text("UPDATE users SET star_points = 0 WHERE star_points IS NULL"))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_star_points ON users(star_points DESC, id)"
+    ))
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS star_ledgers(
+      id INTEGER PRIMARY KEY,
+      user_id INTEGER NOT NULL,
+      points INTEGER NOT NULL,
+      reason VARCHAR(255),
+      created_at TEXT
+    );
+    """))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_star_ledgers_user_id_id ON star_ledgers(user_id, id)"
+    ))
+    db.session.commit()
+
+    # Saldo materializado = SUM(libro); un solo UPDATE en bloque
+    from services.points_service import reconcile_balances
+    n = reconcile_balances()
+    print(f"v16: star_points listo (saldos recalculados: {n})")
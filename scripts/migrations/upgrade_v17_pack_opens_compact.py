@@ -0,0 +1,55 @@
+# scripts/migrations/upgrade_v17_pack_opens_compact.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+BATCH = 500
+
+with flask_app.app_context():
+    from services.packs_service import decode_pack_cards, encode_pack_cards
+
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_pack_opens_user_id_id ON pack_opens(user_id, id)"
+    ))
+    db.session.commit()
+
+    # Reescribe cards_json antiguo (lista de dicts con nombre/imagen) al formato compacto
+    last_id = 0; converted = 0
+    while True:
+        rows = db.session.execute(text(
+            "SELECT id, cards_json FROM pack_opens WHERE id > :last ORDER BY id LIMIT :n"
+        ), {"last": last_id, "n": BATCH}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for rid, raw in rows:
+            if (raw or "").lstrip().startswith("[{"):
+                cards = [{"id": pid, "tier": tier, "duplicate": dup} for pid, tier, dup in decode_pack_cards(raw)]
+                updates.append({"id": rid, "c": encode_pack_cards(cards)})
+        if updates:
+            db.session.execute(text("UPDATE pack_opens SET cards_json = :c WHERE id = :id"), updates)
+            db.session.commit()
+            converted += len(updates)
+        last_id = rows[-1][0]
+    print(f"v17: pack_opens compactado (filas convertidas: {converted})")
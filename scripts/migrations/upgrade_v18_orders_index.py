@@ -0,0 +1,36 @@
+# scripts/migrations/upgrade_v18_orders_index.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_orders_user_created ON orders(user_id, created_at)"
+    ))
+    # los items de una página se cargan con order_id IN (...)
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items(order_id)"
+    ))
+    db.session.commit()
+    print("v18: índices de pedidos listos")
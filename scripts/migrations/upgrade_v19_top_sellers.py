@@ -0,0 +1,49 @@
+# scripts/migrations/upgrade_v19_top_sellers.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS product_sales(
+      product_id INTEGER PRIMARY KEY REFERENCES productos(id),
+      sold INTEGER NOT NULL DEFAULT 0
+    );
+    """))
+    # la PK (scope, scope_key, rank) es el índice de lectura de la ficha
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS top_sellers(
+      scope VARCHAR(16) NOT NULL,
+      scope_key VARCHAR(120) NOT NULL,
+      rank INTEGER NOT NULL,
+      product_id INTEGER NOT NULL REFERENCES productos(id),
+      sold INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (scope, scope_key, rank)
+    );
+    """))
+    db.session.commit()
+
+    from services.top_sellers_service import rebuild_all
+    out = rebuild_all()
+    print(f"v19: top_sellers listo {out}")
@@ -0,0 +1,63 @@
+# scripts/migrations/upgrade_v20_copurchase.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS copurchase_items(
+      product_id INTEGER PRIMARY KEY REFERENCES productos(id),
+      n INTEGER NOT NULL DEFAULT 0
+    );
+    """))
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS copurchase_pairs(
+      a INTEGER NOT NULL,
+      b INTEGER NOT NULL,
+      n INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (a, b)
+    );
+    """))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_copurchase_pairs_b ON copurchase_pairs(b)"))
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS product_neighbors(
+      product_id INTEGER NOT NULL REFERENCES productos(id),
+      rank INTEGER NOT NULL,
+      neighbor_id INTEGER NOT NULL REFERENCES productos(id),
+      score FLOAT NOT NULL,
+      PRIMARY KEY (product_id, rank)
+    );
+    """))
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS job_state(
+      name VARCHAR(64) PRIMARY KEY,
+      last_id INTEGER NOT NULL DEFAULT 0,
+      updated_at DATETIME
+    );
+    """))
+    db.session.commit()
+
+    from services.copurchase_service import update
+    out = update(full=True)
+    print(f"v20: co-compras listas {out}")
@@ -0,0 +1,41 @@
+# scripts/migrations/upgrade_v21_review_aggregates.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    cols = [r[1] for r in db.session.execute(text("PRAGMA table_info(productos)")).fetchall()]
+    if "rating_count" not in cols:
+        db.session.execute(text("ALTER TABLE productos ADD COLUMN rating_count INTEGER NOT NULL DEFAULT 0"))
+    if "rating_sum" not in cols:
+        db.session.execute(text("ALTER TABLE productos ADD COLUMN rating_sum INTEGER NOT NULL DEFAULT 0"))
+    # página de reseñas: product_id = ? AND id < ? ORDER BY id DESC
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_reviews_product_id_id ON reviews(product_id, id)"
+    ))
+    db.session.commit()
+
+    from services.reviews_service import recompute_aggregates
+    n = recompute_aggregates()
+    print(f"v21: agregados de reseñas listos ({n} productos)")
@@ -0,0 +1,59 @@
+# scripts/migrations/upgrade_v22_market_freshness.py
+import os
+from datetime import datetime, timezone
+from sqlalchemy import text, bindparam, DateTime
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+def parse_ts(raw):
+    """Texto heredado ('2025-01-02T03:04:05Z', '2025-01-02 03:04:05.123', '2025-01-02'...) -> datetime UTC naive."""
+    if not raw:
+        return None
+    s = str(raw).strip().replace("Z", "+00:00")
+    try:
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+with flask_app.app_context():
+    # SQLite no cambia tipos de columna: se reescriben los valores al formato
+    # canónico de DateTime (ordenable como texto) y se indexa la columna
+    rows = db.session.execute(text(
+        "SELECT id, market_updated_at FROM productos WHERE market_updated_at IS NOT NULL"
+    )).fetchall()
+    fixed = [{"id": pid, "ts": parse_ts(raw)} for pid, raw in rows]
+    if fixed:
+        db.session.execute(
+            text("UPDATE productos SET market_updated_at = :ts WHERE id = :id").bindparams(
+                bindparam("ts", type_=DateTime)),
+            fixed,
+        )
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_productos_market_updated_at ON productos(market_updated_at)"
+    ))
+    db.session.commit()
+    bad = sum(1 for r in fixed if r["ts"] is None)
+    print(f"v22: market_updated_at normalizado ({len(fixed)} filas, {bad} ilegibles -> NULL)")
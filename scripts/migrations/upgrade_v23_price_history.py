@@ -0,0 +1,50 @@
+# scripts/migrations/upgrade_v23_price_history.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS price_history(
+      id INTEGER PRIMARY KEY,
+      product_id INTEGER NOT NULL REFERENCES productos(id),
+      ts DATETIME NOT NULL,
+      price FLOAT NOT NULL,
+      currency VARCHAR(8),
+      source VARCHAR(40)
+    );
+    """))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_price_history_product_ts ON price_history(product_id, ts)"
+    ))
+    # punto inicial: el precio de mercado actual de cada carta que ya lo tenga
+    n = db.session.execute(text("""
+        INSERT INTO price_history (product_id, ts, price, currency, source)
+        SELECT p.id, p.market_updated_at, p.market_price, p.market_currency, p.market_source
+        FROM productos p
+        WHERE p.market_price IS NOT NULL AND p.market_updated_at IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM price_history h WHERE h.product_id = p.id)
+    """)).rowcount
+    db.session.commit()
+    print(f"v23: price_history listo ({n} puntos iniciales)")
@@ -0,0 +1,48 @@
+# scripts/migrations/upgrade_v24_fx_rates.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+from services.fx_service import load_rates_file, save_rates, renormalize_all
+
+with flask_app.app_context():
+    db.session.execute(text("""
+    CREATE TABLE IF NOT EXISTS fx_rates(
+      currency VARCHAR(8) PRIMARY KEY,
+      rate_to_store FLOAT NOT NULL,
+      source VARCHAR(80),
+      updated_at DATETIME
+    );
+    """))
+    cols = {row[1] for row in db.session.execute(text("PRAGMA table_info(productos)")).fetchall()}
+    if "market_price_norm" not in cols:
+        db.session.execute(text("ALTER TABLE productos ADD COLUMN market_price_norm FLOAT"))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_productos_market_price_norm ON productos(market_price_norm)"
+    ))
+    rates = load_rates_file()
+    save_rates(rates, source="data/fx_rates.json")
+    n = renormalize_all()
+    db.session.commit()
+    print(f"v24: fx_rates listo ({len(rates)} tasas, {n} precios normalizados)")
@@ -0,0 +1,46 @@
+# scripts/migrations/upgrade_v25_list_price.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+with flask_app.app_context():
+    cols = {row[1] for row in db.session.execute(text("PRAGMA table_xinfo(productos)")).fetchall()}
+    if "list_price" not in cols:
+        # columna generada VIRTUAL: no ocupa espacio y no hay que mantenerla
+        db.session.execute(text(
+            "ALTER TABLE productos ADD COLUMN list_price FLOAT "
+            "GENERATED ALWAYS AS (COALESCE(market_price_norm, precio_base)) VIRTUAL"
+        ))
+    # el catálogo filtra categoria con igualdad (usa el índice): normaliza a minúsculas
+    n = db.session.execute(text(
+        "UPDATE productos SET categoria = lower(categoria) WHERE categoria <> lower(categoria)"
+    )).rowcount
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_productos_categoria_list_price ON productos(categoria, list_price)"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_productos_list_price ON productos(list_price)"
+    ))
+    db.session.commit()
+    print(f"v25: list_price listo ({n} categorías normalizadas)")
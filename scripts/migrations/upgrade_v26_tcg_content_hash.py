@@ -0,0 +1,60 @@
+# scripts/migrations/upgrade_v26_tcg_content_hash.py
+import os
+from sqlalchemy import text
+from models import db
+
+try:
+    from app import create_app
+except Exception:
+    create_app = None
+
+flask_app = None
+if create_app:
+    try:
+        flask_app = create_app()
+    except Exception:
+        flask_app = None
+
+if flask_app is None:
+    from flask import Flask
+    proj_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    db_file = os.path.join(proj_root, "store.db")
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_file}"
+    flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(flask_app)
+
+from services.tcg_import_service import UPSTREAM_FIELDS, content_hash
+
+with flask_app.app_context():
+    cols = {row[1] for row in db.session.execute(text("PRAGMA table_info(productos)")).fetchall()}
+    if "content_hash" not in cols:
+        db.session.execute(text("ALTER TABLE productos ADD COLUMN content_hash VARCHAR(40)"))
+    if "retired_at" not in cols:
+        # cartas retiradas por el diff (bajas con historial)
+        db.session.execute(text("ALTER TABLE productos ADD COLUMN retired_at DATETIME"))
+
+    # hash de lo que ya hay: el primer diff solo verá lo que de verdad cambió upstream
+    rows = db.session.execute(text(
+        f"SELECT id, {', '.join(UPSTREAM_FIELDS)} FROM productos "
+        "WHERE content_hash IS NULL AND tcg_card_id IS NOT NULL AND tcg_card_id <> ''"
+    )).mappings().all()
+    if rows:
+        db.session.execute(
+            text("UPDATE productos SET content_hash = :h WHERE id = :id"),
+            [{"id": r["id"], "h": content_hash(r)} for r in rows],
+        )
+
+    # FTS solo se reindexa si cambia nombre/descripcion (no con cada precio o stock)
+    has_fts = db.session.execute(
+        text("SELECT name FROM sqlite_master WHERE type='table' AND name='product_fts'")
+    ).fetchone()
+    if has_fts:
+        db.session.execute(text("DROP TRIGGER IF EXISTS productos_au"))
+        db.session.execute(text("""
+        CREATE TRIGGER productos_au AFTER UPDATE OF nombre, descripcion ON productos BEGIN
+          INSERT INTO product_fts(product_fts, rowid, nombre, descripcion) VALUES('delete', old.id, '', '');
+          INSERT INTO product_fts(rowid, nombre, descripcion) VALUES (new.id, COALESCE(new.nombre,''), COALESCE(new.descripcion,''));
+        END;"""))
+    db.session.commit()
+    print(f"v26: content_hash listo ({len(rows)} cartas con hash inicial, trigger FTS {'actualizado' if has_fts else 'no aplica'})")
@@ -0,0 +1,62 @@
+# services/catalog_service.py
+"""
+Datos por tarjeta del catálogo para una página completa, sin N+1:
+  - precio mostrado (mercado si hay, si no dinámico en lote: calcular_precios)
+  - resumen de reseñas (productos.rating_count/rating_sum, sin consulta)
+  - si está en la wishlist del usuario (una consulta IN)
+Devuelve {product_id: {...}} con las claves de siempre de computed_prices
+(price, currency, using_market, source) más rating, rating_count,
+in_wishlist, market_updated_at y price_store (precio de mercado ya
+normalizado a la moneda de la tienda, productos.market_price_norm; si aún
+no está calculado se convierte con las tasas en caché de fx_service).
+"""
+from typing import Dict, List
+from flask import current_app as flask_current_app
+from models import db, PokemonProducto, Wishlist
+from services.precio_dinamico_service import PrecioDinamicoService
+from services.fx_service import to_store
+
+precio_service = PrecioDinamicoService()
+
+def _dynamic_prices(products: List[PokemonProducto], user) -> Dict[int, float]:
+    if not products:
+        return {}
+    try:
+        return {pid: float(v[0]) for pid, v in precio_service.calcular_precios(products, user).items()}
+    except Exception as e:
+        flask_current_app.logger.error(f"Error calculating dynamic prices for catalog page: {e}", exc_info=True)
+        return {p.id: float(p.precio_base or 0.0) for p in products}
+
+def catalog_card_data(products: List[PokemonProducto], user=None) -> Dict[int, Dict]:
+    if not products:
+        return {}
+    ids = [p.id for p in products]
+    dyn = _dynamic_prices([p for p in products if not p.market_price], user)
+    wished = set()
+    if user is not None:
+        wished = {pid for (pid,) in (
+            db.session.query(Wishlist.product_id)
+            .filter(Wishlist.user_id == user.id, Wishlist.product_id.in_(ids))
+            .all()
+        )}
+
+    out = {}
+    for p in products:
+        if p.market_price:
+            price, curr, using_market, source = round(float(p.market_price), 2), (p.market_currency or "").upper(), True, p.market_source
+            price_store = p.market_price_norm if p.market_price_norm is not None else to_store(p.market_price, p.market_currency)
+        else:
+            price = round(dyn.get(p.id, float(p.precio_base or 0.0)), 2)
+            curr, using_market, source, price_store = "$", False, None, None
+        out[p.id] = {
+            "price": price,
+            "currency": curr,
+            "using_market": using_market,
+            "source": source,
+            "market_updated_at": p.market_updated_at if using_market else None,
+            "price_store": price_store,
+            "rating": p.avg_rating,
+            "rating_count": int(p.rating_count or 0),
+            "in_wishlist": p.id in wished,
+        }
+    return out
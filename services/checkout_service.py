@@ -0,0 +1,109 @@
+# services/checkout_service.py
+from typing import Dict, List, Optional
+from flask import current_app as flask_current_app
+from sqlalchemy import text, insert
+from models import db, Order, OrderItem, PokemonProducto, CartItem
+from services.precio_dinamico_service import PrecioDinamicoService
+from services.promo_service import redeem_code, apply_discount
+from services.top_sellers_service import record_sales, refresh_for_products
+
+precio_service = PrecioDinamicoService()
+
+# Reserva condicional: solo descuenta si alcanza (nunca deja stock negativo)
+_RESERVE_SQL = text("UPDATE productos SET stock = stock - :q WHERE id = :id AND stock >= :q")
+
+def cart_lines(user) -> List[Dict]:
+    """Carrito del usuario con precio dinámico: 1 consulta de carrito + precios en lote."""
+    rows = (
+        db.session.query(CartItem.quantity, PokemonProducto)
+        .join(PokemonProducto, PokemonProducto.id == CartItem.product_id)
+        .filter(CartItem.user_id == user.id)
+        .all()
+    )
+    prices = precio_service.calcular_precios([p for _, p in rows], user)
+    return [
+        {
+            "product_id": int(p.id),
+            "name": p.nombre or f"Producto {p.id}",
+            "qty": int(qty),
+            "unit_price": float(prices[p.id][0]),
+        }
+        for qty, p in rows
+    ]
+
+def place_order(user_id: int, lines: List[Dict], status: str = "created", clear_cart: bool = False,
+                promo_code: Optional[str] = None, ship_name: Optional[str] = None,
+                ship_address: Optional[str] = None) -> Dict:
+    """
+    Crea la orden en una sola transacción:
+      1) reserva stock por línea con UPDATE ... WHERE stock >= :q
+      2) canjea el cupón (UPDATE condicional sobre used_count), si lo hay
+      3) inserta la orden y todos sus items (executemany)
+      4) suma las unidades en product_sales y vacía el carrito si clear_cart
+      5) commit; después refresca los rankings de más vendidos afectados
+    Si alguna línea no alcanza o el cupón ya no es válido, rollback de todo y
+    {"ok": False, "error": ...}.
+    lines: [{"product_id", "name", "qty", "unit_price"}]
+    """
+    if not lines:
+        return {"ok": False, "error": "Tu carrito está vacío."}
+    # Orden estable por id: reservas deterministas entre checkouts concurrentes
+    lines = sorted(lines, key=lambda ln: int(ln["product_id"]))
+    total = round(sum(float(ln["unit_price"]) * int(ln["qty"]) for ln in lines), 2)
+    try:
+        # Todas las reservas en un executemany: si alguna no alcanza, el total
+        # de filas afectadas no cuadra y se deshace todo
+        res = db.session.execute(_RESERVE_SQL, [{"id": int(ln["product_id"]), "q": int(ln["qty"])} for ln in lines])
+        if res.rowcount != len(lines):
+            db.session.rollback()
+            stock = dict(
+                db.session.query(PokemonProducto.id, PokemonProducto.stock)
+                .filter(PokemonProducto.id.in_([int(ln["product_id"]) for ln in lines]))
+                .all()
+            )
+            ln = next((ln for ln in lines if int(stock.get(int(ln["product_id"])) or 0) < int(ln["qty"])), lines[0])
+            avail = stock.get(int(ln["product_id"]))
+            return {
+                "ok": False,
+                "product_id": int(ln["product_id"]),
+                "error": (f"No hay suficiente stock para {ln['name']}. "
+                          f"Disponible: {int(avail or 0)}, Solicitado: {int(ln['qty'])}"),
+            }
+
+        promo = None
+        if promo_code:
+            promo = redeem_code(promo_code)
+            if not promo:
+                db.session.rollback()
+                return {"ok": False, "promo_code": promo_code, "error": "El cupón no es válido o ya se agotó."}
+            total = apply_discount(total, promo)
+
+        order = Order(user_id=user_id, total=total, status=status, ship_name=ship_name, ship_address=ship_address)
+        db.session.add(order)
+        db.session.flush()  # order.id para los OrderItems
+        db.session.execute(insert(OrderItem), [
+            {
+                "order_id": order.id, "product_id": int(ln["product_id"]), "product_name": ln["name"],
+                "unit_price": float(ln["unit_price"]), "quantity": int(ln["qty"]),
+            }
+            for ln in lines
+        ])
+        record_sales(lines)
+        if clear_cart:
+            CartItem.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    try:
+        refresh_for_products(int(ln["product_id"]) for ln in lines)
+    except Exception as e:
+        # el pedido ya está confirmado; el ranking se corrige con rebuild_top_sellers.py
+        flask_current_app.logger.warning(f"top_sellers refresh error: {e}", exc_info=True)
+    return {"ok": True, "order_id": order.id, "total": total, "promo": promo["code"] if promo else None}
+
+def checkout_cart(user, promo_code: Optional[str] = None, ship_name: Optional[str] = None,
+                  ship_address: Optional[str] = None) -> Dict:
+    """Checkout completo del carrito en DB: precios en lote, orden, items y carrito vaciado en un commit."""
+    return place_order(user.id, cart_lines(user), clear_cart=True, promo_code=promo_code,
+                       ship_name=ship_name, ship_address=ship_address)
@@ -0,0 +1,218 @@
+# services/copurchase_service.py
+"""
+"Quienes compraron esto también compraron": co-ocurrencia ítem a ítem.
+
+Cada pedido (order_items) es una cesta; en la reconstrucción completa también
+cuenta la colección de cada usuario (user_cards). Las cestas de más de
+MAX_BASKET productos se recortan a los de más cantidad. Se guardan conteos
+dispersos:
+  copurchase_items(product_id, n)  cestas con el producto
+  copurchase_pairs(a, b, n)        cestas con ambos (a < b)
+y de ahí la similitud (coseno n_ab / sqrt(n_a * n_b) o Jaccard
+n_ab / (n_a + n_b - n_ab)). Solo se guardan los TOP_K vecinos por producto en
+product_neighbors, así que servir la recomendación es una lectura por PK.
+
+update() procesa solo los pedidos nuevos desde la última ejecución (job_state)
+y recalcula los vecinos de los productos tocados y de sus pares. Los cambios en
+las colecciones no entran en el modo incremental: solo se recogen con
+update(full=True), así que conviene programar una reconstrucción completa
+periódica.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import combinations
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import func, text, bindparam
+from models import db, PokemonProducto, OrderItem, UserCard, ProductNeighbor, JobState
+
+TOP_K = 10
+MAX_BASKET = 50      # cestas más grandes se recortan a los MAX_BASKET de más cantidad (los pares crecen en n^2)
+JOB_NAME = "copurchase"
+_CHUNK = 500
+
+_ADD_ITEM_SQL = text("""
+    INSERT INTO copurchase_items (product_id, n) VALUES (:p, :n)
+    ON CONFLICT(product_id) DO UPDATE SET n = n + excluded.n
+""")
+_ADD_PAIR_SQL = text("""
+    INSERT INTO copurchase_pairs (a, b, n) VALUES (:a, :b, :n)
+    ON CONFLICT(a, b) DO UPDATE SET n = n + excluded.n
+""")
+_PAIRS_BY_A_SQL = text("SELECT a, b, n FROM copurchase_pairs WHERE a IN :ids").bindparams(
+    bindparam("ids", expanding=True))
+_PAIRS_BY_B_SQL = text("SELECT a, b, n FROM copurchase_pairs WHERE b IN :ids").bindparams(
+    bindparam("ids", expanding=True))
+_ITEM_COUNTS_SQL = text("SELECT product_id, n FROM copurchase_items WHERE product_id IN :ids").bindparams(
+    bindparam("ids", expanding=True))
+_DELETE_NEIGHBORS_SQL = text("DELETE FROM product_neighbors WHERE product_id IN :ids").bindparams(
+    bindparam("ids", expanding=True))
+_INSERT_NEIGHBOR_SQL = text(
+    "INSERT INTO product_neighbors (product_id, rank, neighbor_id, score) VALUES (:p, :r, :nb, :s)"
+)
+
+def _score(n_ab: int, n_a: int, n_b: int, metric: str) -> float:
+    if metric == "jaccard":
+        return n_ab / float(n_a + n_b - n_ab) if n_a + n_b - n_ab > 0 else 0.0
+    return n_ab / math.sqrt(n_a * n_b) if n_a and n_b else 0.0
+
+def _chunks(ids: List[int]):
+    for i in range(0, len(ids), _CHUNK):
+        yield ids[i:i + _CHUNK]
+
+def _order_baskets(after_id: int):
+    """(order_id, [product_ids]) de los pedidos con id > after_id, en orden; cada cesta va de más a menos cantidad."""
+    cur_id, cur = None, []
+    rows = (
+        db.session.query(OrderItem.order_id, OrderItem.product_id)
+        .filter(OrderItem.order_id > after_id)
+        .order_by(OrderItem.order_id, OrderItem.quantity.desc(), OrderItem.id)
+        .yield_per(5000)
+    )
+    for oid, pid in rows:
+        if oid != cur_id:
+            if cur:
+                yield cur_id, cur
+            cur_id, cur = oid, []
+        cur.append(int(pid))
+    if cur:
+        yield cur_id, cur
+
+def _collection_baskets():
+    """[product_ids] de la colección de cada usuario, de más a menos cantidad."""
+    cur_uid, cur = None, []
+    rows = (
+        db.session.query(UserCard.user_id, UserCard.product_id)
+        .order_by(UserCard.user_id, UserCard.qty.desc(), UserCard.product_id)
+        .yield_per(5000)
+    )
+    for uid, pid in rows:
+        if uid != cur_uid:
+            if cur:
+                yield cur
+            cur_uid, cur = uid, []
+        cur.append(int(pid))
+    if cur:
+        yield cur
+
+def _count(baskets: Iterable[List[int]], items: Counter, pairs: Counter) -> None:
+    for basket in baskets:
+        # recorta en el orden de la cesta (cantidad) y después ordena para los pares (a < b)
+        ids = sorted(list(dict.fromkeys(basket))[:MAX_BASKET])
+        items.update(ids)
+        if len(ids) > 1:
+            pairs.update(combinations(ids, 2))
+
+def _partners(ids: List[int]) -> Set[int]:
+    out = set()
+    for chunk in _chunks(ids):
+        out.update(b for _, b, _ in db.session.execute(_PAIRS_BY_A_SQL, {"ids": chunk}))
+        out.update(a for a, _, _ in db.session.execute(_PAIRS_BY_B_SQL, {"ids": chunk}))
+    return out
+
+def _recompute_neighbors(ids: List[int], k: int, metric: str) -> int:
+    """Recalcula el top-K de esos productos desde los conteos guardados."""
+    adj: Dict[int, List] = defaultdict(list)
+    for chunk in _chunks(ids):
+        for a, b, n in db.session.execute(_PAIRS_BY_A_SQL, {"ids": chunk}):
+            adj[a].append((b, n))
+        for a, b, n in db.session.execute(_PAIRS_BY_B_SQL, {"ids": chunk}):
+            adj[b].append((a, n))
+    need = set(ids) | {nb for lst in adj.values() for nb, _ in lst}
+    counts: Dict[int, int] = {}
+    for chunk in _chunks(sorted(need)):
+        counts.update(db.session.execute(_ITEM_COUNTS_SQL, {"ids": chunk}).fetchall())
+
+    rows = []
+    for pid in ids:
+        scored = ((_score(n, counts.get(pid, 0), counts.get(nb, 0), metric), nb) for nb, n in adj.get(pid, ()))
+        for rank, (s, nb) in enumerate(heapq.nlargest(k, scored), start=1):
+            rows.append({"p": pid, "r": rank, "nb": nb, "s": round(s, 6)})
+    for chunk in _chunks(ids):
+        db.session.execute(_DELETE_NEIGHBORS_SQL, {"ids": chunk})
+    if rows:
+        db.session.execute(_INSERT_NEIGHBOR_SQL, rows)
+    return len(rows)
+
+def update(full: bool = False, k: int = TOP_K, metric: str = "cosine") -> Dict[str, int]:
+    """
+    Incremental: suma los pedidos con id > job_state.last_id (no mira
+    user_cards; las colecciones quedan como en la última reconstrucción).
+    full=True: borra conteos y vecinos y recalcula desde todos los pedidos
+    más las colecciones de user_cards.
+    """
+    state = db.session.get(JobState, JOB_NAME)
+    if state is None:
+        state = JobState(name=JOB_NAME, last_id=0)
+        db.session.add(state)
+    if full:
+        for t in ("copurchase_items", "copurchase_pairs", "product_neighbors"):
+            db.session.execute(text(f"DELETE FROM {t}"))
+        state.last_id = 0
+
+    items, pairs = Counter(), Counter()
+    last_id = int(state.last_id or 0)
+    orders = 0
+
+    def order_sets():
+        nonlocal last_id, orders
+        for oid, basket in _order_baskets(last_id):
+            last_id = max(last_id, int(oid))
+            orders += 1
+            yield basket
+
+    try:
+        _count(order_sets(), items, pairs)
+        if full:
+            _count(_collection_baskets(), items, pairs)
+
+        if items:
+            db.session.execute(_ADD_ITEM_SQL, [{"p": p, "n": n} for p, n in items.items()])
+        if pairs:
+            db.session.execute(_ADD_PAIR_SQL, [{"a": a, "b": b, "n": n} for (a, b), n in pairs.items()])
+
+        if full:
+            affected = sorted(r[0] for r in db.session.execute(text("SELECT product_id FROM copurchase_items")))
+        else:
+            touched = sorted(items)
+            affected = sorted(set(touched) | _partners(touched))
+        neighbors = _recompute_neighbors(affected, k, metric) if affected else 0
+
+        state.last_id = last_id
+        state.updated_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"orders": orders, "items": len(items), "pairs": len(pairs),
+            "recomputed": len(affected), "neighbors": neighbors, "last_order_id": last_id}
+
+def also_bought(product_id: int, limit: int = 4) -> List[PokemonProducto]:
+    """Vecinos ya ordenados de un producto: una lectura por PK."""
+    return (
+        db.session.query(PokemonProducto)
+        .join(ProductNeighbor, ProductNeighbor.neighbor_id == PokemonProducto.id)
+        .filter(ProductNeighbor.product_id == product_id)
+        .order_by(ProductNeighbor.rank)
+        .limit(limit)
+        .all()
+    )
+
+def also_bought_for_cart(product_ids: Iterable[int], limit: int = 4) -> List[PokemonProducto]:
+    """Vecinos de todo el carrito (suma de scores), sin los productos que ya están en él."""
+    ids = sorted({int(i) for i in product_ids})
+    if not ids:
+        return []
+    score = func.sum(ProductNeighbor.score)
+    rows = (
+        db.session.query(PokemonProducto, score)
+        .join(ProductNeighbor, ProductNeighbor.neighbor_id == PokemonProducto.id)
+        .filter(ProductNeighbor.product_id.in_(ids), ProductNeighbor.neighbor_id.notin_(ids))
+        .group_by(PokemonProducto.id)
+        .order_by(score.desc(), PokemonProducto.id)
+        .limit(limit)
+        .all()
+    )
+    return [p for p, _ in rows]
@@ -0,0 +1,82 @@
+# services/fx_service.py
+"""
+Tipos de cambio para normalizar precios de mercado (USD de tcgplayer, EUR de
+cardmarket...) a la moneda de la tienda (STORE_CURRENCY, USD por defecto).
+
+La fuente es un archivo local (FX_RATES_FILE, por defecto data/fx_rates.json,
+formato {"base": "USD", "rates": {"EUR": 0.92, ...}} = unidades por 1 base)
+que se carga en la tabla fx_rates; así todo funciona sin red. Las
+conversiones en Python (to_store, p. ej. el catálogo cuando un producto aún no
+tiene market_price_norm) usan una caché en memoria con TTL; en SQL,
+productos.market_price_norm se calcula con una subconsulta a fx_rates, tanto
+al escribir precios como en renormalize_all() cuando cambian las tasas.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import text
+from models import db, FxRate
+
+STORE_CURRENCY = os.getenv("STORE_CURRENCY", "USD").upper()
+_PROJ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RATES_FILE = os.getenv("FX_RATES_FILE") or os.path.join(_PROJ, "data", "fx_rates.json")
+
+_fx_cache = {"data": None, "timestamp": None}
+_FX_CACHE_TTL_SECONDS = 600
+
+# expresión SQL reutilizable: precio * tasa de su moneda (NULL si no hay tasa)
+NORM_SQL = "(SELECT f.rate_to_store FROM fx_rates f WHERE f.currency = upper({currency}))"
+
+def load_rates_file(path: Optional[str] = None) -> Dict[str, float]:
+    """{moneda: tasa a la moneda de la tienda} a partir del archivo local."""
+    with open(path or RATES_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rates = {k.upper(): float(v) for k, v in (data.get("rates") or {}).items() if v}
+    base = (data.get("base") or "USD").upper()
+    rates.setdefault(base, 1.0)
+    if STORE_CURRENCY not in rates:
+        raise ValueError(f"El archivo de tasas no incluye la moneda de la tienda ({STORE_CURRENCY})")
+    # rates = unidades por 1 base -> 1 unidad de X = rates[store] / rates[X] en moneda de la tienda
+    return {cur: rates[STORE_CURRENCY] / r for cur, r in rates.items()}
+
+def save_rates(rates: Dict[str, float], source: str = "file") -> int:
+    """Upsert de todas las tasas (executemany). Sin commit."""
+    now = datetime.utcnow()
+    db.session.execute(text("""
+        INSERT INTO fx_rates (currency, rate_to_store, source, updated_at) VALUES (:c, :r, :s, :ts)
+        ON CONFLICT(currency) DO UPDATE SET rate_to_store = excluded.rate_to_store,
+            source = excluded.source, updated_at = excluded.updated_at
+    """), [{"c": c, "r": r, "s": source, "ts": now} for c, r in rates.items()])
+    invalidate_fx_cache()
+    return len(rates)
+
+def renormalize_all() -> int:
+    """Recalcula market_price_norm de todo el catálogo en un UPDATE. Sin commit."""
+    return db.session.execute(text(f"""
+        UPDATE productos
+        SET market_price_norm = ROUND(market_price * {NORM_SQL.format(currency="productos.market_currency")}, 2)
+        WHERE market_price IS NOT NULL
+    """)).rowcount
+
+def invalidate_fx_cache() -> None:
+    _fx_cache["data"] = None
+    _fx_cache["timestamp"] = None
+
+def rates() -> Dict[str, float]:
+    now = time.time()
+    if _fx_cache["data"] is not None and now - _fx_cache["timestamp"] < _FX_CACHE_TTL_SECONDS:
+        return _fx_cache["data"]
+    data = {c: float(r) for c, r in db.session.query(FxRate.currency, FxRate.rate_to_store).all()}
+    data.setdefault(STORE_CURRENCY, 1.0)
+    _fx_cache["data"] = data
+    _fx_cache["timestamp"] = now
+    return data
+
+def to_store(amount: Optional[float], currency: Optional[str]) -> Optional[float]:
+    """Convierte a la moneda de la tienda; None si no hay tasa para esa moneda."""
+    if amount is None:
+        return None
+    rate = rates().get((currency or STORE_CURRENCY).upper())
+    return round(float(amount) * rate, 2) if rate is not None else None
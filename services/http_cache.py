@@ -0,0 +1,166 @@
+# services/http_cache.py
+"""
+Caché HTTP en disco compartida por los clientes de datos externos
+(pokemontcg.io, GitHub pokemon-tcg-data).
+
+Por cada URL (+ params) guarda el cuerpo comprimido (gzip) y sus validadores
+ETag / Last-Modified. La siguiente petición va con If-None-Match /
+If-Modified-Since; un 304 devuelve el cuerpo guardado sin volver a bajarlo y
+marca la respuesta como `not_modified`, así los jobs diarios pueden saltarse
+los sets que no cambiaron.
+
+Tamaño máximo (HTTP_CACHE_MAX_MB, 256 por defecto) con expulsión LRU: cada
+acierto actualiza el mtime del .meta y al pasarse se borran los más antiguos.
+Directorio: HTTP_CACHE_DIR o <proyecto>/.http_cache.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+
+_PROJ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_DIR = os.getenv("HTTP_CACHE_DIR") or os.path.join(_PROJ, ".http_cache")
+DEFAULT_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+def cache_key(url: str, params: Optional[dict] = None) -> str:
+    full = url + ("?" + urlencode(sorted((params or {}).items())) if params else "")
+    return hashlib.sha1(full.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """Lo mínimo de requests.Response que usan los clientes (status_code, content, json())."""
+
+    def __init__(self, status_code: int, content: bytes, headers=None,
+                 not_modified: bool = False):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.not_modified = not_modified
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8")) if self.content else None
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+
+class HttpCache:
+    def __init__(self, directory: str = DEFAULT_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + ".meta", base + ".body.gz"
+
+    def get(self, key: str) -> Optional[Dict]:
+        meta_p, body_p = self._paths(key)
+        try:
+            with open(meta_p, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_p, "rb") as f:
+                meta["body"] = gzip.decompress(f.read())
+            os.utime(meta_p)  # LRU
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def validators(self, entry: Optional[Dict]) -> Dict[str, str]:
+        h = {}
+        if entry:
+            if entry.get("etag"):
+                h["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                h["If-Modified-Since"] = entry["last_modified"]
+        return h
+
+    def put(self, key: str, url: str, body: bytes, headers) -> None:
+        etag, last_mod = headers.get("ETag"), headers.get("Last-Modified")
+        if not etag and not last_mod:
+            return  # sin validadores no hay petición condicional posible
+        meta_p, body_p = self._paths(key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(body_p + suffix, "wb") as f:
+            f.write(gzip.compress(body, compresslevel=6))
+        os.replace(body_p + suffix, body_p)
+        meta = {"url": url, "etag": etag, "last_modified": last_mod, "stored_at": time.time(),
+                "size": os.path.getsize(body_p)}
+        with open(meta_p + suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_p + suffix, meta_p)
+        self.evict()
+
+    def evict(self) -> int:
+        """Borra las entradas menos usadas hasta quedar por debajo de max_bytes."""
+        with self._lock:
+            entries, total = [], 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".meta"):
+                    continue
+                meta_p = os.path.join(self.directory, name)
+                body_p = meta_p[:-5] + ".body.gz"
+                try:
+                    size = os.path.getsize(body_p) + os.path.getsize(meta_p)
+                    entries.append((os.path.getmtime(meta_p), size, meta_p, body_p))
+                except OSError:
+                    continue
+                total += size
+            removed = 0
+            for _, size, meta_p, body_p in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for p in (meta_p, body_p):
+                    try:
+                        os.remove(p)
+                    except OSError:
+                        pass
+                total -= size
+                removed += 1
+            return removed
+
+
+_default_cache: Optional[HttpCache] = None
+_local = threading.local()
+
+
+def default_cache() -> HttpCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HttpCache()
+    return _default_cache
+
+
+def _session() -> requests.Session:
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = requests.Session()
+    return s
+
+
+def cached_get(url: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+               timeout: float = 30, cache: Optional[HttpCache] = None) -> CachedResponse:
+    """
+    GET condicional. 200 -> guarda y devuelve; 304 -> cuerpo guardado con
+    not_modified=True. Los errores de red se propagan como en requests.get.
+    """
+    cache = cache or default_cache()
+    key = cache_key(url, params)
+    entry = cache.get(key)
+    h = dict(headers or {})
+    h.update(cache.validators(entry))
+    resp = _session().get(url, params=params, headers=h, timeout=timeout)
+    if resp.status_code == 304 and entry is not None:
+        return CachedResponse(200, entry["body"], resp.headers, not_modified=True)
+    if resp.status_code == 200:
+        cache.put(key, url, resp.content, resp.headers)
+    return CachedResponse(resp.status_code, resp.content, resp.headers)
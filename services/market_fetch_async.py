@@ -0,0 +1,217 @@
+# services/market_fetch_async.py
+"""
+Motor asíncrono (asyncio + httpx) para descargar precios de pokemontcg.io:
+  - un solo AsyncClient (pool de conexiones keep-alive) para todo el job
+  - TokenBucket global: todas las peticiones comparten el mismo presupuesto;
+    un 429 con Retry-After pausa el bucket entero (no solo esa petición) y
+    reduce el ritmo a la mitad
+  - concurrencia acotada (semáforo = tamaño del pool)
+  - paginación por set en paralelo: la 1ª página trae totalCount y el resto
+    se piden a la vez
+
+Con `cache` (services.http_cache.HttpCache) las páginas van como GET
+condicionales; los sets cuyas páginas dieron todas 304 quedan en
+`fetcher.unchanged` (informativo: el cuerpo cacheado se devuelve igual y el
+job lo compara con la DB, un 304 no dice nada de lo que ya está escrito).
+Los sets con alguna página fallida o menos cartas que totalCount quedan en
+`fetcher.incomplete`: sus cartas ausentes no deben darse por verificadas.
+Una excepción al bajar un set (p. ej. un 200 con JSON roto) no corta los
+demás: iter_sets lo entrega vacío, en `incomplete`, con el error en
+`fetcher.errors`.
+
+La URL base sale de POKEMONTCG_BASE_URL (por defecto la API real), así se
+puede probar contra scripts/bench/mock_pokemontcg.py.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from services.http_cache import HttpCache, cache_key
+
+DEFAULT_BASE = "https://api.pokemontcg.io/v2"
+CARD_FIELDS = "number,tcgplayer,cardmarket"
+
+
+class TokenBucket:
+    """`rate` peticiones/s con ráfagas de hasta `burst`. pause() bloquea a todos hasta un instante dado."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = self.max_rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float, backoff: float = 0.5, min_rate: float = 0.5) -> None:
+        """
+        429: nadie sale hasta dentro de `seconds`. El ritmo baja a la mitad una
+        sola vez por episodio (los 429 que llegan durante la pausa no cuentan)
+        y vuelve a subir poco a poco con cada éxito (on_success).
+        """
+        now = time.monotonic()
+        if now >= self.paused_until:
+            self.rate = max(min_rate, self.rate * backoff)
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+
+    def on_success(self, step: float = 0.25) -> None:
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + step)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                cap = max(1.0, min(self.capacity, self.rate))
+                self.tokens = min(cap, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _retry_after_seconds(resp: httpx.Response, default: float = 1.0) -> float:
+    raw = resp.headers.get("Retry-After")
+    try:
+        return max(0.0, float(raw)) if raw else default
+    except ValueError:
+        return default
+
+
+class AsyncMarketFetcher:
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 rate: float = 10.0, burst: int = 10, concurrency: int = 8,
+                 timeout: float = 25.0, retries: int = 4, max_retry_after: float = 60.0,
+                 max_throttles: int = 20, cache: Optional[HttpCache] = None):
+        self.api_key = api_key if api_key is not None else os.getenv("POKEMONTCG_API_KEY", "")
+        self.base_url = (base_url or os.getenv("POKEMONTCG_BASE_URL") or DEFAULT_BASE).rstrip("/")
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.max_retry_after = max_retry_after
+        self.max_throttles = max_throttles
+        self.cache = cache
+        self.unchanged: set = set()
+        self.incomplete: set = set()
+        self.errors: Dict[str, str] = {}
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "not_modified": 0}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncMarketFetcher":
+        headers = {"Accept": "application/json"}
+        if self.api_key:
+            headers["X-Api-Key"] = self.api_key
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        self._sem = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._client.aclose()
+
+    async def get_json(self, path: str, params: Optional[dict] = None) -> Optional[dict]:
+        return (await self._get_json(path, params))[0]
+
+    async def _get_json(self, path: str, params: Optional[dict] = None) -> Tuple[Optional[dict], bool]:
+        """
+        (json, not_modified). GET con bucket global; 429 -> pausa global según
+        Retry-After; red/5xx -> backoff (retries).
+        """
+        key = cache_key(self.base_url + path, params) if self.cache else None
+        entry = self.cache.get(key) if self.cache else None
+        cond = self.cache.validators(entry) if self.cache else {}
+        attempt = throttles = 0
+        while attempt < self.retries and throttles < self.max_throttles:
+            await self.bucket.acquire()
+            async with self._sem:
+                self.stats["requests"] += 1
+                try:
+                    resp = await self._client.get(path, params=params, headers=cond)
+                except httpx.HTTPError:
+                    resp = None
+            if resp is None or resp.status_code >= 500:
+                self.stats["errors"] += 1
+                await asyncio.sleep(min(5.0, 0.5 * 2 ** attempt))
+                attempt += 1
+                continue
+            if resp.status_code == 429:
+                self.stats["throttled"] += 1
+                self.bucket.pause(min(self.max_retry_after, _retry_after_seconds(resp)))
+                throttles += 1
+                continue
+            self.bucket.on_success()
+            if resp.status_code == 304 and entry is not None:
+                self.stats["not_modified"] += 1
+                return json.loads(entry["body"]), True
+            if resp.status_code != 200:
+                return None, False
+            if self.cache:
+                self.cache.put(key, self.base_url + path, resp.content, resp.headers)
+            return resp.json(), False
+        return None, False
+
+    async def _page(self, set_code: str, page: int, page_size: int) -> Tuple[Optional[dict], bool]:
+        return await self._get_json("/cards", params={
+            "q": f"set.id:{set_code}", "pageSize": page_size, "page": page, "select": CARD_FIELDS,
+        })
+
+    async def fetch_set_cards(self, set_code: str, page_size: int = 250) -> List[dict]:
+        set_code = (set_code or "").lower().strip()
+        first, same = await self._page(set_code, 1, page_size)
+        if not first:
+            self.incomplete.add(set_code)
+            return []
+        data = list(first.get("data") or [])
+        total = int(first.get("totalCount") or len(data))
+        pages = math.ceil(total / page_size) if page_size else 1
+        if pages > 1:
+            rest = await asyncio.gather(*(self._page(set_code, n, page_size) for n in range(2, pages + 1)))
+            for body, nm in rest:
+                data.extend((body or {}).get("data") or [])
+                same = same and nm and body is not None
+        if len(data) < total:
+            self.incomplete.add(set_code)  # alguna página falló
+        if same and data:
+            self.unchanged.add(set_code)
+        return data
+
+    async def iter_sets(self, set_codes: Iterable[str], page_size: int = 250
+                        ) -> AsyncIterator[Tuple[str, List[dict]]]:
+        """(set_code, cartas) a medida que cada set termina (todos en paralelo)."""
+        async def one(sc: str):
+            try:
+                return sc, await self.fetch_set_cards(sc, page_size=page_size)
+            except Exception as e:
+                code = (sc or "").lower().strip()
+                self.incomplete.add(code)
+                self.errors[code] = f"{type(e).__name__}: {e}"
+                return sc, []
+        for fut in asyncio.as_completed([one(sc) for sc in set_codes]):
+            yield await fut
+
+
+def fetch_sets(set_codes: Iterable[str], **kwargs) -> Dict[str, List[dict]]:
+    """Atajo síncrono: descarga varios sets en paralelo y devuelve {set_code: cartas}."""
+    async def _run():
+        out = {}
+        async with AsyncMarketFetcher(**kwargs) as f:
+            async for sc, cards in f.iter_sets(set_codes):
+                out[sc] = cards
+        return out
+    return asyncio.run(_run())
@@ -1,10 +1,88 @@
-﻿import os, time, requests
+﻿import os, time, requests, queue, threading
 from datetime import datetime, timedelta
 from typing import Optional, Tuple, List, Dict
+from sqlalchemy import text, bindparam, DateTime, or_, true
 from models import db, PokemonProducto
+from services.http_cache import cached_get
+from services.price_history_service import record_price_points
+from services.fx_service import NORM_SQL
+
+_PRICE_UPDATE_SQL = text(f"""
+    UPDATE productos
+    SET market_price = :price, market_currency = :currency, market_source = :source, market_updated_at = :ts,
+        market_price_norm = ROUND(:price * {NORM_SQL.format(currency=":currency")}, 2)
+    WHERE id = :id
+""").bindparams(bindparam("ts", type_=DateTime))
+# precio igual pero ya verificado: solo se renueva la frescura
+_PRICE_TOUCH_SQL = text(
+    "UPDATE productos SET market_updated_at = :ts WHERE id = :id"
+).bindparams(bindparam("ts", type_=DateTime))
+
+def stale_cutoff(max_age_days: Optional[int]) -> Optional[datetime]:
+    return datetime.utcnow() - timedelta(days=max_age_days) if max_age_days else None
+
+def stale_filter(cutoff: Optional[datetime]):
+    """Predicado SQL (usa ix_productos_market_updated_at): sin precio verificado o más viejo que cutoff."""
+    if cutoff is None:
+        return true()
+    return or_(PokemonProducto.market_updated_at.is_(None), PokemonProducto.market_updated_at < cutoff)
+
+def write_price_changes(conn, rows: List[dict]) -> int:
+    """
+    executemany sobre una sesión o conexión (sin commit). Filas con "price"
+    cambian el precio y añaden su punto a price_history; filas solo {id, ts}
+    renuevan la frescura. Devuelve cuántos precios cambiaron.
+    """
+    changed = [r for r in rows if "price" in r]
+    touched = [r for r in rows if "price" not in r]
+    if changed:
+        conn.execute(_PRICE_UPDATE_SQL, changed)
+        record_price_points(conn, changed)
+    if touched:
+        conn.execute(_PRICE_TOUCH_SQL, touched)
+    return len(changed)
+
+class PriceWriter:
+    """
+    Escritor único de precios: los fetchers (hilos o asyncio) encolan los
+    cambios de cada set y un solo hilo los aplica, un executemany + commit por
+    set, sobre su propia conexión. La cola está acotada para que un writer
+    lento frene a los fetchers en vez de acumular memoria.
+    """
+    _STOP = object()
+
+    def __init__(self, engine, maxsize: int = 32):
+        self.engine = engine
+        self._q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self.written = 0
+        self.errors: List[str] = []
+        self._thread = threading.Thread(target=self._run, name="price-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, set_code: str, rows: List[dict]) -> None:
+        if rows:
+            self._q.put((set_code, rows))
+
+    def _run(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is self._STOP:
+                return
+            set_code, rows = item
+            try:
+                with self.engine.begin() as conn:
+                    self.written += write_price_changes(conn, rows)
+            except Exception as e:
+                self.errors.append(f"{set_code}: {e}")
+
+    def close(self) -> int:
+        """Espera a que se escriba todo lo encolado y devuelve las filas escritas."""
+        self._q.put(self._STOP)
+        self._thread.join()
+        return self.written
 
 class MarketPriceService:
-    BASE = "https://api.pokemontcg.io/v2"
+    BASE = os.getenv("POKEMONTCG_BASE_URL", "https://api.pokemontcg.io/v2").rstrip("/")
 
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("POKEMONTCG_API_KEY", "")
@@ -15,12 +93,16 @@ class MarketPriceService:
             h["X-Api-Key"] = self.api_key
         return h
 
-    def _get(self, path: str, params: dict | None = None, timeout: float = 20, retries: int = 3):
+    def _get(self, path: str, params: dict | None = None, timeout: float = 20, retries: int = 3,
+             cached: bool = False):
         url = f"{self.BASE}{path}"
         resp = None
         for i in range(retries):
             try:
-                resp = requests.get(url, headers=self._headers(), params=params, timeout=timeout)
+                if cached:
+                    resp = cached_get(url, params=params, headers=self._headers(), timeout=timeout)
+                else:
+                    resp = requests.get(url, headers=self._headers(), params=params, timeout=timeout)
             except Exception:
                 time.sleep(min(3, 0.5*(i+1)))
                 continue
@@ -36,7 +118,19 @@ class MarketPriceService:
         return resp
 
     def _fetch_set_cards(self, set_code: str, page_size: int = 250, sleep: float = 0.0) -> List[dict]:
+        return self._fetch_set_cards_cached(set_code, page_size=page_size, sleep=sleep)[0]
+
+    def _fetch_set_cards_cached(self, set_code: str, page_size: int = 250, sleep: float = 0.0
+                                ) -> Tuple[List[dict], bool, bool]:
+        """
+        (cartas, sin_cambios, completo): GET condicionales; sin_cambios si todas
+        las páginas dieron 304; completo si ninguna página falló y llegaron
+        tantas cartas como dice totalCount.
+        """
         data: List[dict] = []
+        unchanged = True
+        failed = False
+        total = None
         page = 1
         set_code = (set_code or "").lower().strip()
         while True:
@@ -48,11 +142,18 @@ class MarketPriceService:
                     "page": page,
                     "select": "number,tcgplayer,cardmarket"
                 },
-                timeout=25
+                timeout=25,
+                cached=True
             )
             if not resp or resp.status_code != 200:
+                unchanged = False
+                failed = True
                 break
-            arr = (resp.json() or {}).get("data") or []
+            unchanged = unchanged and getattr(resp, "not_modified", False)
+            body = resp.json() or {}
+            if total is None and body.get("totalCount") is not None:
+                total = int(body["totalCount"])
+            arr = body.get("data") or []
             if not arr:
                 break
             data.extend(arr)
@@ -61,7 +162,8 @@ class MarketPriceService:
             page += 1
             if sleep:
                 time.sleep(sleep)
-        return data
+        complete = not failed and (total is None or len(data) >= total)
+        return data, unchanged and bool(data), complete
 
     def _fetch_card_json(self, set_code: str, number: int | str) -> Optional[dict]:
         for cid in (f"{set_code.upper()}-{number}", f"{set_code.lower()}-{number}"):
@@ -114,7 +216,45 @@ class MarketPriceService:
         set_code = (set_code or "").lower().strip()
         if not set_code:
             return 0
-        api_cards = self._fetch_set_cards(set_code, page_size=250, sleep=sleep)
+        if max_age_days and not self.has_stale(set_code, max_age_days):
+            return 0  # todo el set está fresco: ni siquiera se pide
+        # un 304 solo ahorra la descarga: el cuerpo cacheado se compara igual
+        # con la DB (puede haber cartas nuevas o vencidas sin precio aplicado)
+        api_cards, _, complete = self._fetch_set_cards_cached(set_code, page_size=250, sleep=sleep)
+        return self.apply_set_prices(set_code, api_cards, max_age_days=max_age_days, complete=complete)
+
+    def has_stale(self, set_code: str, max_age_days: Optional[int]) -> bool:
+        return db.session.query(
+            PokemonProducto.query.filter(
+                PokemonProducto.categoria == "tcg",
+                PokemonProducto.tcg_card_id.like(f"{set_code}-%"),
+                stale_filter(stale_cutoff(max_age_days)),
+            ).exists()
+        ).scalar()
+
+    def apply_set_prices(self, set_code: str, api_cards: List[dict], max_age_days: Optional[int] = None,
+                         complete: bool = True) -> int:
+        """Aplica a la DB los precios de un set ya descargado (sync o async)."""
+        rows = self.price_changes(set_code, api_cards, max_age_days=max_age_days, complete=complete)
+        n = 0
+        if rows:
+            n = write_price_changes(db.session, rows)
+            db.session.commit()
+        return n
+
+    def price_changes(self, set_code: str, api_cards: List[dict], max_age_days: Optional[int] = None,
+                      complete: bool = True) -> List[dict]:
+        """
+        Solo lectura: filas {id, price, currency, source, ts} de las cartas del
+        set cuyo precio/moneda/fuente cambió. La escritura va aparte
+        (write_price_changes / PriceWriter), así el cálculo puede ir en paralelo.
+        Con max_age_days solo mira las filas vencidas (predicado SQL) y las que
+        no cambiaron (o no tienen precio en la API) vuelven como {id, ts} para
+        renovar su frescura. Si la descarga quedó incompleta (complete=False:
+        falló alguna página) las cartas ausentes no se marcan como
+        verificadas: pueden estar en la página que faltó.
+        """
+        set_code = (set_code or "").lower().strip()
         mapping: Dict[str, Tuple[float, str, str]] = {}
         for c in api_cards:
             price, curr, src = self._extract_market(c)
@@ -123,26 +263,23 @@ class MarketPriceService:
             num = str((c.get("number") or "")).strip()
             for k in self._number_keys(num):
                 mapping[k] = (float(price), curr, src)
-        if not mapping:
-            return 0
+        if not mapping and not (max_age_days and api_cards):
+            return []
 
-        q = PokemonProducto.query.filter(
+        q = db.session.query(
+            PokemonProducto.id, PokemonProducto.tcg_card_id, PokemonProducto.market_price,
+            PokemonProducto.market_currency, PokemonProducto.market_source, PokemonProducto.market_updated_at,
+        ).filter(
             PokemonProducto.categoria == "tcg",
             PokemonProducto.tcg_card_id.isnot(None),
             PokemonProducto.tcg_card_id != "",
-            PokemonProducto.tcg_card_id.like(f"{set_code}-%")
+            PokemonProducto.tcg_card_id.like(f"{set_code}-%"),
+            stale_filter(stale_cutoff(max_age_days)),
         )
-        cutoff = datetime.utcnow() - timedelta(days=max_age_days) if max_age_days else None
-        updated = 0
-        for p in q:
-            if cutoff and getattr(p, "market_updated_at", None):
-                ts = p.market_updated_at
-                try:
-                    if ts and ts > cutoff:
-                        continue
-                except Exception:
-                    pass
-            _, num = self._parse_tcg_id(p.tcg_card_id or "")
+        now = datetime.utcnow()
+        rows = []
+        for pid, tcg_id, old_price, old_curr, old_src, ts in q:
+            _, num = self._parse_tcg_id(tcg_id or "")
             if not num:
                 continue
             found = None
@@ -152,43 +289,38 @@ class MarketPriceService:
                     found = v
                     break
             if not found:
+                if max_age_days and complete:
+                    rows.append({"id": pid, "ts": now})  # verificada: la API no tiene precio
                 continue
             pr, curr, src = found
-            p.market_price = round(pr, 2)
-            p.market_currency = curr
-            p.market_source = src
-            p.market_updated_at = datetime.utcnow()
-            db.session.add(p)
-            updated += 1
-        if updated:
-            db.session.commit()
-        return updated
+            pr = round(pr, 2)
+            if old_price is not None and round(float(old_price), 2) == pr and old_curr == curr and old_src == src:
+                if max_age_days:
+                    rows.append({"id": pid, "ts": now})
+                continue
+            rows.append({"id": pid, "price": pr, "currency": curr, "source": src, "ts": now})
+        return rows
 
     def update_prices(self, set_code: Optional[str] = None, sleep: float = 0.25, limit: Optional[int] = None, max_age_days: Optional[int] = None) -> int:
+        # solo las cartas vencidas (y del set pedido) salen de la consulta
         q = PokemonProducto.query.filter(
             PokemonProducto.categoria == "tcg",
             PokemonProducto.tcg_card_id.isnot(None),
-            PokemonProducto.tcg_card_id != ""
-        ).order_by(PokemonProducto.id.asc())
-        updated = 0; count = 0
-        cutoff = datetime.utcnow() - timedelta(days=max_age_days) if max_age_days else None
+            PokemonProducto.tcg_card_id != "",
+            stale_filter(stale_cutoff(max_age_days)),
+        )
+        if set_code:
+            q = q.filter(PokemonProducto.tcg_card_id.like(f"{set_code.lower()}-%"))
+        q = q.order_by(PokemonProducto.id.asc())
+        if limit:
+            q = q.limit(limit)
+        changes: List[dict] = []; count = 0
         total = q.count()
-        for p in q:
-            if limit and count >= limit:
-                break
+        for p in q.all():
             count += 1
             sc, num = self._parse_tcg_id(p.tcg_card_id or "")
             if not sc or not num:
                 continue
-            if set_code and sc.lower() != set_code.lower():
-                continue
-            if cutoff and getattr(p, "market_updated_at", None):
-                ts = p.market_updated_at
-                try:
-                    if ts and ts > cutoff:
-                        continue
-                except Exception:
-                    pass
             try:
                 number_int = None
                 try: number_int = int(str(num).lstrip("0") or "0")
@@ -196,18 +328,26 @@ class MarketPriceService:
                 card = self._fetch_card_json(sc, number_int)
                 price, curr, src = self._extract_market(card)
                 if price:
-                    p.market_price = round(float(price), 2)
-                    p.market_currency = curr
-                    p.market_source = src
-                    p.market_updated_at = datetime.utcnow()
-                    db.session.add(p); updated += 1
+                    pr = round(float(price), 2)
+                    if not (p.market_price is not None and round(float(p.market_price), 2) == pr
+                            and p.market_currency == curr and p.market_source == src):
+                        changes.append({"id": p.id, "price": pr, "currency": curr, "source": src,
+                                        "ts": datetime.utcnow()})
+                    elif max_age_days:
+                        changes.append({"id": p.id, "ts": datetime.utcnow()})
+                elif card and max_age_days:
+                    # la API tiene la carta pero sin precio: verificada igual (como price_changes)
+                    changes.append({"id": p.id, "ts": datetime.utcnow()})
             except Exception:
                 pass
             if sleep:
                 time.sleep(sleep)
             if count % 50 == 0:
-                print(f"[{count}/{total}] actualizadas: {updated}")
-        if updated:
+                print(f"[{count}/{total}] con cambios: {len(changes)}")
+        # una sola escritura al final (executemany, solo filas que cambiaron)
+        updated = 0
+        if changes:
+            updated = write_price_changes(db.session, changes)
             db.session.commit()
         print(f"Fin. procesadas={count}, actualizadas={updated}")
         return updated
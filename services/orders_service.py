@@ -0,0 +1,36 @@
+# services/orders_service.py
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
+from models import Order
+
+def encode_cursor(order: Order) -> str:
+    return f"{order.created_at.isoformat()}_{order.id}"
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    try:
+        ts, oid = (cursor or "").rsplit("_", 1)
+        return datetime.fromisoformat(ts), int(oid)
+    except Exception:
+        return None
+
+def orders_page(user_id: int, cursor: Optional[str] = None, limit: int = 10) -> Dict:
+    """
+    Página de pedidos (recientes primero) por keyset sobre
+    ix_orders_user_created (user_id, created_at): una consulta para los
+    pedidos y otra (selectinload) para los items de toda la página.
+    """
+    limit = max(1, min(50, int(limit or 10)))
+    q = (
+        Order.query
+        .options(selectinload(Order.items))
+        .filter(Order.user_id == user_id)
+    )
+    after = decode_cursor(cursor)
+    if after:
+        q = q.filter(tuple_(Order.created_at, Order.id) < tuple_(*after))
+    rows = q.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {"orders": rows, "next_cursor": encode_cursor(rows[-1]) if (rows and has_more) else None}
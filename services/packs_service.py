@@ -1,7 +1,9 @@
-﻿import json, random, datetime
-from typing import List, Dict
-from models import db, PokemonProducto, User
-from models_packs import PackRule, PackAllowance, PackOpen, UserCard, StarLedger
+﻿import json, random, datetime, time
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+from sqlalchemy import text
+from models import db, PokemonProducto
+from models_packs import PackRule, PackAllowance, PackOpen, UserCard
+from services.points_service import award_points
 
 def rarity_tier(r: str) -> str:
     if not r: return "common"
@@ -13,6 +15,7 @@ def rarity_tier(r: str) -> str:
     return "common"
 
 STAR_POINTS = {"common":1, "uncommon":2, "rare":5, "illustration":25}
+TIER_CODES = ("common", "uncommon", "rare", "illustration")  # índice = código guardado en pack_opens
 
 def today_str() -> str:
     return datetime.date.today().strftime("%Y-%m-%d")
@@ -36,6 +39,48 @@ def get_or_create_allowance(user_id: int, set_code: str) -> PackAllowance:
         db.session.add(a); db.session.commit()
     return a
 
+def consume_pack_allowance(user_id: int, set_code: str, today: Optional[str] = None) -> Optional[str]:
+    """
+    Consume el pack diario o, si ya se usó hoy, un bonus token, con sentencias
+    condicionales (sin leer-y-escribir en Python): dos peticiones concurrentes
+    nunca obtienen el mismo pack.
+    Devuelve "daily", "bonus" o None si no queda nada que consumir.
+    No hace commit: el llamador confirma junto con las cartas del pack.
+    """
+    today = today or today_str()
+    params = {"u": user_id, "s": set_code, "d": today, "now": datetime.datetime.utcnow()}
+    # Diario: crea la fila si falta y marca hoy solo si aún no estaba marcado
+    res = db.session.execute(text("""
+        INSERT INTO pack_allowances(user_id, set_code, last_daily_open_date, bonus_tokens, created_at)
+        VALUES (:u, :s, :d, 0, :now)
+        ON CONFLICT(user_id, set_code) DO UPDATE SET last_daily_open_date = excluded.last_daily_open_date
+        WHERE pack_allowances.last_daily_open_date IS NULL
+           OR pack_allowances.last_daily_open_date <> excluded.last_daily_open_date
+    """), params)
+    if res.rowcount:
+        return "daily"
+    res = db.session.execute(text("""
+        UPDATE pack_allowances SET bonus_tokens = bonus_tokens - 1
+        WHERE user_id = :u AND set_code = :s AND bonus_tokens > 0
+    """), params)
+    return "bonus" if res.rowcount else None
+
+def allowance_status(user_id: int, set_codes: Iterable[str], today: Optional[str] = None) -> Dict[str, Dict]:
+    """{set_code: {"daily": bool, "bonus": int}} para varios sets en una sola consulta."""
+    today = today or today_str()
+    codes = list(set_codes)
+    out = {sc: {"daily": True, "bonus": 0} for sc in codes}
+    if not codes:
+        return out
+    rows = (
+        db.session.query(PackAllowance.set_code, PackAllowance.last_daily_open_date, PackAllowance.bonus_tokens)
+        .filter(PackAllowance.user_id == user_id, PackAllowance.set_code.in_(codes))
+        .all()
+    )
+    for sc, last, bonus in rows:
+        out[sc] = {"daily": last != today, "bonus": int(bonus or 0)}
+    return out
+
 def universe_for_set(set_code: str) -> List[PokemonProducto]:
     like_prefix = f"{set_code.lower()}-%"
     rows = db.session.query(PokemonProducto).filter(
@@ -86,21 +131,6 @@ def open_pack(user_id: int, set_code: str, admin_unlimited: bool = False) -> Dic
     if not rule.enabled and not admin_unlimited:
         return {"ok": False, "error": "Pack deshabilitado para este set."}
 
-    allow = get_or_create_allowance(user_id, set_code)
-    today = today_str()
-
-    can_daily = (allow.last_daily_open_date != today)
-    used_bonus = False
-
-    if not admin_unlimited:
-        if not can_daily:
-            if allow.bonus_tokens > 0:
-                allow.bonus_tokens -= 1
-                used_bonus = True
-            else:
-                return {"ok": False, "error": "Sin pack diario ni bonus tokens."}
-    # Admin ilimitado: no consume diario ni tokens
-
     seed = int(datetime.datetime.utcnow().strftime("%Y%m%d")) ^ (user_id * 131) ^ (hash(set_code) & 0xffffffff)
     rng = random.Random(seed)
 
@@ -108,35 +138,138 @@ def open_pack(user_id: int, set_code: str, admin_unlimited: bool = False) -> Dic
     if not picks:
         return {"ok": False, "error": "No hay cartas para ese set."}
 
-    owned_ids = {uc.tcg_card_id for uc in UserCard.query.filter_by(user_id=user_id, set_code=set_code).all()}
+    # Admin ilimitado: no consume diario ni tokens
+    used_bonus = False
+    if not admin_unlimited:
+        grant = consume_pack_allowance(user_id, set_code)
+        if not grant:
+            db.session.rollback()
+            return {"ok": False, "error": "Sin pack diario ni bonus tokens."}
+        used_bonus = (grant == "bonus")
+
+    ids = list({int(c.id) for c in picks})
+    existing = {
+        uc.product_id: uc
+        for uc in UserCard.query.filter(UserCard.user_id == user_id, UserCard.product_id.in_(ids)).all()
+    }
     dup_points = 0; results = []
     for c in picks:
-        is_dup = (c.tcg_card_id in owned_ids)
+        pid = int(c.id)
+        is_dup = pid in existing
         results.append({
             "id": c.id, "tcg_card_id": c.tcg_card_id, "name": c.nombre,
             "rarity": c.rarity, "image_url": c.image_url, "duplicate": is_dup
         })
-        db.session.add(UserCard(user_id=user_id, tcg_card_id=c.tcg_card_id, set_code=set_code,
-                                name=c.nombre, rarity=c.rarity, image_url=c.image_url))
         if is_dup:
+            existing[pid].qty = int(existing[pid].qty or 0) + 1
             dup_points += STAR_POINTS.get(rarity_tier(c.rarity), 1)
-
-    if can_daily and not admin_unlimited:
-        allow.last_daily_open_date = today
-    db.session.add(allow)
+        else:
+            existing[pid] = UserCard(user_id=user_id, product_id=pid, qty=1)
+            db.session.add(existing[pid])
 
     # No otorgar puntos al admin cuando abre ilimitado
-    award_points = not admin_unlimited
-    if dup_points and award_points:
-        u = User.query.get(user_id)
-        if u:
-            try:
-                u.star_points = (getattr(u,"star_points",0) or 0) + dup_points
-                db.session.add(u)
-            except Exception:
-                pass
-        db.session.add(StarLedger(user_id=user_id, points=dup_points, reason=f"Duplicados {set_code}"))
-
-    db.session.add(PackOpen(user_id=user_id, set_code=set_code, cards_json=json.dumps(results)))
+    give_points = not admin_unlimited
+    if dup_points and give_points:
+        award_points(user_id, dup_points, f"Duplicados {set_code}")
+
+    db.session.add(PackOpen(user_id=user_id, set_code=set_code, cards_json=encode_pack_cards(results)))
     db.session.commit()
-    return {"ok": True, "set_code": set_code, "cards": results, "dup_points": (dup_points if award_points else 0), "used_bonus": used_bonus}
+    return {"ok": True, "set_code": set_code, "cards": results, "dup_points": (dup_points if give_points else 0), "used_bonus": used_bonus}
+
+# --------- historial compacto de aperturas ----------
+# pack_opens.cards_json guarda solo [[product_id, tier, duplicado], ...];
+# nombre/imagen/rareza se hidratan desde productos al leer.
+
+def encode_pack_cards(cards: Iterable[Dict]) -> str:
+    packed = []
+    for c in cards:
+        tier = c.get("tier") or rarity_tier(c.get("rarity"))
+        packed.append([int(c["id"]), TIER_CODES.index(tier), 1 if c.get("duplicate") else 0])
+    return json.dumps(packed, separators=(",", ":"))
+
+def decode_pack_cards(raw: str) -> List[Tuple[int, str, bool]]:
+    """(product_id, tier, duplicado) por carta; acepta también el formato antiguo (lista de dicts)."""
+    try:
+        data = json.loads(raw or "[]")
+    except Exception:
+        return []
+    out = []
+    for e in data:
+        try:
+            if isinstance(e, dict):
+                out.append((int(e["id"]), rarity_tier(e.get("rarity")), bool(e.get("duplicate"))))
+            else:
+                out.append((int(e[0]), TIER_CODES[int(e[1])], bool(e[2])))
+        except Exception:
+            continue
+    return out
+
+_CARD_CACHE: Dict[int, Tuple[float, Dict]] = {}
+_CARD_CACHE_TTL_SECONDS = 3600
+_CARD_CACHE_MAX = 20000
+
+def product_card_info(ids: Iterable[int]) -> Dict[int, Dict]:
+    """Datos de presentación por producto; solo consulta (en bloque) los ids que no están en caché."""
+    now = time.time()
+    wanted = {int(i) for i in ids}
+    out, missing = {}, []
+    for pid in wanted:
+        hit = _CARD_CACHE.get(pid)
+        if hit and now - hit[0] < _CARD_CACHE_TTL_SECONDS:
+            out[pid] = hit[1]
+        else:
+            missing.append(pid)
+    if missing:
+        if len(_CARD_CACHE) + len(missing) > _CARD_CACHE_MAX:
+            _CARD_CACHE.clear()
+        rows = (
+            db.session.query(PokemonProducto.id, PokemonProducto.nombre, PokemonProducto.image_url,
+                             PokemonProducto.rarity, PokemonProducto.tcg_card_id)
+            .filter(PokemonProducto.id.in_(missing))
+            .all()
+        )
+        for pid, name, img, rarity, tid in rows:
+            info = {"name": name, "image_url": img, "rarity": rarity, "tcg_card_id": tid}
+            _CARD_CACHE[pid] = (now, info)
+            out[pid] = info
+    return out
+
+def _hydrate_opens(rows: List[PackOpen]) -> List[Dict]:
+    decoded = [(r, decode_pack_cards(r.cards_json)) for r in rows]
+    info = product_card_info(pid for _, cards in decoded for pid, _, _ in cards)
+    items = []
+    for r, cards in decoded:
+        items.append({
+            "id": r.id,
+            "set_code": r.set_code,
+            "opened_at": r.opened_at.isoformat() if r.opened_at else None,
+            "cards": [
+                dict(info.get(pid) or {"name": f"Card {pid}", "image_url": None, "rarity": None, "tcg_card_id": None},
+                     id=pid, tier=tier, duplicate=dup)
+                for pid, tier, dup in cards
+            ],
+        })
+    return items
+
+def _pack_history_page(user_id: int, before_id: Optional[int], limit: int) -> Dict:
+    q = PackOpen.query.filter(PackOpen.user_id == user_id)
+    if before_id:
+        q = q.filter(PackOpen.id < int(before_id))
+    rows = q.order_by(PackOpen.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {"items": _hydrate_opens(rows), "next_before": rows[-1].id if (rows and has_more) else None}
+
+def pack_history(user_id: int, before_id: Optional[int] = None, limit: int = 20) -> Dict:
+    """Página de aperturas (recientes primero) por keyset sobre (user_id, id)."""
+    return _pack_history_page(user_id, before_id, max(1, min(100, int(limit or 20))))
+
+def iter_pack_history(user_id: int, batch: int = 200) -> Iterator[Dict]:
+    """Recorre todo el historial por lotes (memoria acotada a un lote)."""
+    before = None
+    while True:
+        page = _pack_history_page(user_id, before, batch)
+        yield from page["items"]
+        before = page["next_before"]
+        if not before:
+            break
@@ -0,0 +1,99 @@
+# services/points_service.py
+"""
+Puntos estrella: star_ledgers es el libro (append-only) y users.star_points el
+saldo materializado. Ambos se escriben en la misma transacción, así que el
+historial y los rankings nunca necesitan SUM(points) sobre el libro.
+"""
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from models import db, User
+from models_packs import StarLedger
+
+def award_points(user_id: int, points: int, reason: str = "") -> int:
+    """
+    Añade un movimiento al libro y ajusta el saldo con un UPDATE relativo
+    (sin leer el saldo en Python). No hace commit: el llamador confirma junto
+    con el resto de su operación. Devuelve los puntos aplicados.
+    """
+    points = int(points or 0)
+    if not points:
+        return 0
+    db.session.add(StarLedger(user_id=user_id, points=points, reason=(reason or "")[:255]))
+    db.session.execute(
+        text("UPDATE users SET star_points = COALESCE(star_points, 0) + :p WHERE id = :u"),
+        {"p": points, "u": user_id}
+    )
+    return points
+
+def get_balance(user_id: int) -> int:
+    return int(db.session.query(User.star_points).filter(User.id == user_id).scalar() or 0)
+
+def points_history(user_id: int, before_id: Optional[int] = None, limit: int = 20) -> Dict:
+    """
+    Página de movimientos (más recientes primero) por keyset sobre
+    (user_id, id): cada página es un rango del índice, sin OFFSET.
+    """
+    limit = max(1, min(100, int(limit or 20)))
+    q = StarLedger.query.filter(StarLedger.user_id == user_id)
+    if before_id:
+        q = q.filter(StarLedger.id < int(before_id))
+    rows = q.order_by(StarLedger.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [
+            {
+                "id": r.id, "points": r.points, "reason": r.reason,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in rows
+        ],
+        "next_before": rows[-1].id if (rows and has_more) else None,
+    }
+
+def display_alias(full_name: Optional[str], user_id: int) -> str:
+    """Nombre público: nombre de pila + inicial ("Ana María López" -> "Ana L."), nunca el completo."""
+    parts = (full_name or "").split()
+    if not parts:
+        return f"Entrenador {user_id}"
+    return f"{parts[0]} {parts[-1][0].upper()}." if len(parts) > 1 else parts[0]
+
+def leaderboard(n: int = 10, viewer_id: Optional[int] = None) -> List[Dict]:
+    """
+    Top-N por saldo, leído en orden del índice ix_users_star_points. Solo
+    expone el alias (display_alias), no el nombre completo ni el id.
+    """
+    n = max(1, min(100, int(n or 10)))
+    rows = (
+        db.session.query(User.id, User.full_name, User.star_points)
+        .filter(User.star_points > 0)
+        .order_by(User.star_points.desc(), User.id.asc())
+        .limit(n)
+        .all()
+    )
+    return [
+        {"rank": i + 1, "name": display_alias(name, uid), "points": int(pts or 0), "me": uid == viewer_id}
+        for i, (uid, name, pts) in enumerate(rows)
+    ]
+
+def reconcile_balances(dry_run: bool = False) -> int:
+    """
+    Recalcula todos los saldos desde el libro en bloque (un GROUP BY y un
+    UPDATE). Devuelve cuántos usuarios estaban desalineados.
+    """
+    drift_sql = """
+        SELECT u.id FROM users u
+        LEFT JOIN (SELECT user_id, SUM(points) AS s FROM star_ledgers GROUP BY user_id) l
+          ON l.user_id = u.id
+        WHERE COALESCE(u.star_points, 0) <> COALESCE(l.s, 0)
+    """
+    drifted = [r[0] for r in db.session.execute(text(drift_sql)).fetchall()]
+    if dry_run or not drifted:
+        return len(drifted)
+    db.session.execute(text(f"""
+        UPDATE users SET star_points = COALESCE(
+          (SELECT SUM(points) FROM star_ledgers WHERE star_ledgers.user_id = users.id), 0)
+        WHERE id IN ({drift_sql})
+    """))
+    db.session.commit()
+    return len(drifted)
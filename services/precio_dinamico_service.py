@@ -1,6 +1,6 @@
 # services/precio_dinamico_service.py
-from typing import Tuple, List, Dict
-from models import db, Order, OrderItem, PokemonProducto, User
+from typing import Tuple, List, Dict, Iterable
+from models import db, Order, OrderItem, PokemonProducto, User, ProductView
 from sqlalchemy import func
 
 class PrecioDinamicoService:
@@ -35,26 +35,48 @@ class PrecioDinamicoService:
             .filter(Order.user_id == user_id, OrderItem.product_id == product_id).count()
         return seen and not bought
 
-    def calcular_precio(self, producto: PokemonProducto, user: User | None) -> Tuple[float, List[str], Dict]:
+    def _purchases_by_type(self, user_id: int, tipos: Iterable[str]) -> Dict[str, int]:
+        tipos = list({t for t in tipos if t})
+        if not tipos:
+            return {}
+        rows = db.session.query(PokemonProducto.tipo, func.coalesce(func.sum(OrderItem.quantity), 0))\
+            .join(Order, OrderItem.order_id == Order.id)\
+            .join(PokemonProducto, OrderItem.product_id == PokemonProducto.id)\
+            .filter(Order.user_id == user_id, PokemonProducto.tipo.in_(tipos))\
+            .group_by(PokemonProducto.tipo).all()
+        return {t: int(n or 0) for t, n in rows}
+
+    def _seen_not_bought_ids(self, user_id: int, product_ids: Iterable[int]) -> set:
+        ids = list({int(i) for i in product_ids})
+        if not user_id or not ids:
+            return set()
+        seen = {pid for (pid,) in db.session.query(ProductView.product_id)
+                .filter(ProductView.user_id == user_id, ProductView.product_id.in_(ids)).distinct()}
+        if not seen:
+            return set()
+        bought = {pid for (pid,) in db.session.query(OrderItem.product_id).join(Order)
+                  .filter(Order.user_id == user_id, OrderItem.product_id.in_(seen)).distinct()}
+        return seen - bought
+
+    def _aplicar_reglas(self, producto: PokemonProducto, user: User | None, favs: List[str],
+                        same_type: int, seen_not_bought: bool) -> Tuple[float, List[str], Dict]:
         base = float(producto.precio_base)
         factor = 0.0
         razones: List[str] = []
         feats: Dict = {"precio_base": base, "stock": producto.stock, "tipo": producto.tipo}
 
         if user:
-            favs = [t.lower() for t in (user.get_favoritos() or [])]
             if producto.tipo.lower() in favs:
                 factor += 0.10; razones.append("Favorito (+10%)")
             else:
                 factor -= 0.05; razones.append("No favorito (-5%)")
 
-            same_type = self._purchases_same_type(user.id, producto.tipo)
             bump = min(0.02 * same_type, 0.10)
             if bump > 0:
                 factor += bump; razones.append(f"Historial mismo tipo (+{int(bump*100)}%)")
             feats["purchases_same_type"] = same_type
 
-            if self._seen_not_bought(user.id, producto.id):
+            if seen_not_bought:
                 factor -= 0.03; razones.append("Visto y no comprado (-3%)")
                 feats["seen_not_bought"] = 1
             else:
@@ -77,4 +99,27 @@ class PrecioDinamicoService:
             razones.append(f"Ajustado a techo 180% (${techo})")
             precio = techo
 
-        return precio, razones, feats
\ No newline at end of file
+        return precio, razones, feats
+
+    def calcular_precio(self, producto: PokemonProducto, user: User | None) -> Tuple[float, List[str], Dict]:
+        if not user:
+            return self._aplicar_reglas(producto, None, [], 0, False)
+        favs = [t.lower() for t in (user.get_favoritos() or [])]
+        same_type = self._purchases_same_type(user.id, producto.tipo)
+        return self._aplicar_reglas(producto, user, favs, same_type, self._seen_not_bought(user.id, producto.id))
+
+    def calcular_precios(self, productos: Iterable[PokemonProducto], user: User | None) -> Dict[int, Tuple[float, List[str], Dict]]:
+        """
+        Igual que calcular_precio pero para una lista completa (carrito, página
+        del catálogo): como mucho 3 consultas en total en vez de 3 por producto.
+        """
+        productos = list(productos)
+        if not user:
+            return {p.id: self._aplicar_reglas(p, None, [], 0, False) for p in productos}
+        favs = [t.lower() for t in (user.get_favoritos() or [])]
+        by_type = self._purchases_by_type(user.id, (p.tipo for p in productos))
+        snb = self._seen_not_bought_ids(user.id, (p.id for p in productos))
+        return {
+            p.id: self._aplicar_reglas(p, user, favs, by_type.get(p.tipo, 0), p.id in snb)
+            for p in productos
+        }
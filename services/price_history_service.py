@@ -0,0 +1,105 @@
+# services/price_history_service.py
+"""
+Historial de precios de mercado (price_history).
+
+Solo se guardan puntos de cambio: los updaters insertan una fila por cada
+precio que cambió, en el mismo executemany/commit que actualiza productos.
+prune_history() lo mantiene acotado: detalle completo los últimos
+`full_days`, un punto por producto y día (el último) hasta `keep_days`, y
+nada más viejo.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import text, bindparam, DateTime
+from models import db, PokemonProducto, PriceHistory
+
+_INSERT_SQL = text("""
+    INSERT INTO price_history (product_id, ts, price, currency, source)
+    VALUES (:id, :ts, :price, :currency, :source)
+""").bindparams(bindparam("ts", type_=DateTime))
+
+def record_price_points(conn, rows: List[dict]) -> int:
+    """rows con {id, ts, price, currency, source} (las mismas de write_price_changes). Sin commit."""
+    if rows:
+        conn.execute(_INSERT_SQL, rows)
+    return len(rows)
+
+def price_series(product_id: int, days: int = 90) -> List[Dict]:
+    """Serie para sparkline: una consulta de rango sobre (product_id, ts)."""
+    since = datetime.utcnow() - timedelta(days=days)
+    rows = (
+        db.session.query(PriceHistory.ts, PriceHistory.price, PriceHistory.currency)
+        .filter(PriceHistory.product_id == product_id, PriceHistory.ts >= since)
+        .order_by(PriceHistory.ts)
+        .all()
+    )
+    return [{"ts": ts.isoformat(timespec="seconds"), "price": price, "currency": curr} for ts, price, curr in rows]
+
+def prune_history(full_days: int = 30, keep_days: int = 365) -> Dict[str, int]:
+    now = datetime.utcnow()
+    full_cutoff, keep_cutoff = now - timedelta(days=full_days), now - timedelta(days=keep_days)
+    try:
+        dropped = db.session.execute(
+            text("DELETE FROM price_history WHERE ts < :c").bindparams(bindparam("c", type_=DateTime)),
+            {"c": keep_cutoff},
+        ).rowcount
+        # más allá de full_days: el último punto de cada (producto, día)
+        downsampled = db.session.execute(text("""
+            DELETE FROM price_history WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY product_id, substr(ts, 1, 10) ORDER BY ts DESC, id DESC
+                    ) AS rn
+                    FROM price_history WHERE ts < :c
+                ) WHERE rn > 1
+            )
+        """).bindparams(bindparam("c", type_=DateTime)), {"c": full_cutoff}).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"dropped": dropped, "downsampled": downsampled}
+
+def daily_movers(hours: int = 24, limit: int = 20, min_price: float = 0.0) -> Dict[str, List[Dict]]:
+    """
+    Mayores subidas/bajadas en las últimas `hours`, en una sola pasada por
+    el índice (product_id, ts): por producto, base = último precio antes de
+    la ventana y actual = último precio. Si la moneda cambia (la fuente pasó
+    de tcgplayer/USD a cardmarket/EUR o al revés) ese punto es la nueva base:
+    no se comparan precios en monedas distintas.
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    rows = (
+        db.session.query(PriceHistory.product_id, PriceHistory.ts, PriceHistory.price, PriceHistory.currency)
+        .order_by(PriceHistory.product_id, PriceHistory.ts)
+        .yield_per(10000)
+    )
+    moves = []
+
+    def close(pid, base, last, curr, moved):
+        if pid is not None and moved and base and last is not None and base >= min_price and last != base:
+            moves.append({"product_id": pid, "from": base, "to": last, "currency": curr,
+                          "change_pct": round((last - base) / base * 100.0, 2)})
+
+    cur, base, last, curr, moved = None, None, None, None, False
+    for pid, ts, price, currency in rows:
+        if pid != cur:
+            close(cur, base, last, curr, moved)
+            cur, base, last, curr, moved = pid, None, None, currency, False
+        if ts < since or (last is not None and (currency or "").upper() != (curr or "").upper()):
+            base = price
+        if ts >= since:
+            moved = True
+        last, curr = price, currency
+    close(cur, base, last, curr, moved)
+
+    moves.sort(key=lambda m: m["change_pct"])
+    losers, gainers = moves[:limit], moves[::-1][:limit]
+    ids = {m["product_id"] for m in losers + gainers}
+    names = dict(
+        db.session.query(PokemonProducto.id, PokemonProducto.nombre).filter(PokemonProducto.id.in_(ids)).all()
+    ) if ids else {}
+    for m in losers + gainers:
+        m["nombre"] = names.get(m["product_id"], "")
+    return {"gainers": [m for m in gainers if m["change_pct"] > 0],
+            "losers": [m for m in losers if m["change_pct"] < 0]}
@@ -0,0 +1,44 @@
+# services/product_page_service.py
+from typing import Dict, Optional
+from sqlalchemy import select, exists
+from models import db, Review, Order, OrderItem, Wishlist
+
+REVIEWS_PAGE = 10
+
+def load_product_page(p, user_id: Optional[int] = None, reviews_before: Optional[int] = None,
+                      limit: int = REVIEWS_PAGE) -> Dict:
+    """
+    Datos de la ficha de producto (reseñas y estado del usuario):
+      1) página de reseñas más recientes (keyset por id, índice product_id+id)
+      2) si hay usuario, una fila con id de mi reseña, si lo compré y si está
+         en mi wishlist (subconsultas escalares)
+    La media y el total salen de productos.rating_sum/rating_count.
+    Compartido por product_detail y ai_ask_product.
+    """
+    q = Review.query.filter(Review.product_id == p.id)
+    if reviews_before:
+        q = q.filter(Review.id < reviews_before)
+    reviews = q.order_by(Review.id.desc()).limit(limit + 1).all()
+    more = len(reviews) > limit
+    reviews = reviews[:limit]
+
+    my_review, purchased, in_wishlist = None, False, False
+    if user_id:
+        my_q = select(Review.id).where(Review.product_id == p.id, Review.user_id == user_id).scalar_subquery()
+        bought_q = exists().where(
+            OrderItem.order_id == Order.id, OrderItem.product_id == p.id, Order.user_id == user_id
+        )
+        wish_q = exists().where(Wishlist.user_id == user_id, Wishlist.product_id == p.id)
+        my_id, purchased, in_wishlist = db.session.execute(select(my_q, bought_q, wish_q)).one()
+        if my_id:
+            my_review = next((r for r in reviews if r.id == my_id), None) or db.session.get(Review, my_id)
+
+    return {
+        "reviews": reviews,
+        "reviews_next": reviews[-1].id if more else None,
+        "review_count": int(p.rating_count or 0),
+        "avg_rating": p.avg_rating,
+        "my_review": my_review,
+        "purchased": bool(purchased),
+        "in_wishlist": bool(in_wishlist),
+    }
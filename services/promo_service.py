@@ -0,0 +1,76 @@
+# services/promo_service.py
+"""
+Cupones: la validación (render de carrito/checkout) se sirve desde una caché
+en memoria con TTL; el canje es un UPDATE condicional que valida e incrementa
+used_count en la misma sentencia, así un cupón con max_uses=1 solo se canjea
+una vez aunque lleguen checkouts simultáneos.
+"""
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import text, bindparam, DateTime
+from models import db, PromoCode
+
+_promo_cache = {"data": None, "timestamp": None}
+_PROMO_CACHE_TTL_SECONDS = 60
+
+_REDEEM_SQL = text("""
+    UPDATE promo_codes SET used_count = COALESCE(used_count, 0) + 1
+    WHERE id = :id AND active = 1
+      AND (expires_at IS NULL OR expires_at > :now)
+      AND (max_uses IS NULL OR COALESCE(used_count, 0) < max_uses)
+""").bindparams(bindparam("now", type_=DateTime))
+
+def normalize_code(code: Optional[str]) -> str:
+    return (code or "").strip().upper()
+
+def _active_codes() -> Dict[str, Dict]:
+    now = time.time()
+    if _promo_cache["data"] is not None and now - _promo_cache["timestamp"] < _PROMO_CACHE_TTL_SECONDS:
+        return _promo_cache["data"]
+    rows = PromoCode.query.filter(PromoCode.active.is_(True)).all()
+    data = {
+        normalize_code(p.code): {
+            "id": p.id, "code": p.code, "percent": int(p.percent or 0),
+            "max_uses": p.max_uses, "used_count": int(p.used_count or 0), "expires_at": p.expires_at,
+        }
+        for p in rows
+    }
+    _promo_cache["data"] = data
+    _promo_cache["timestamp"] = now
+    return data
+
+def invalidate_promo_cache() -> None:
+    _promo_cache["data"] = None
+
+def validate_code(code: Optional[str]) -> Optional[Dict]:
+    """Cupón aplicable (según la caché) o None. No toca la DB si la caché está fresca."""
+    promo = _active_codes().get(normalize_code(code))
+    if not promo:
+        return None
+    if promo["expires_at"] and promo["expires_at"] < datetime.utcnow():
+        return None
+    if promo["max_uses"] is not None and promo["used_count"] >= promo["max_uses"]:
+        return None
+    return promo
+
+def redeem_code(code: Optional[str]) -> Optional[Dict]:
+    """
+    Canjea el cupón con un UPDATE condicional (la fuente de verdad es la DB,
+    no la caché). Devuelve el cupón canjeado o None. No hace commit: va en la
+    transacción del checkout.
+    """
+    promo = validate_code(code)
+    if not promo:
+        return None
+    res = db.session.execute(_REDEEM_SQL, {"id": promo["id"], "now": datetime.utcnow()})
+    if res.rowcount != 1:
+        invalidate_promo_cache()  # la caché creía que quedaban usos
+        return None
+    return promo
+
+def apply_discount(total: float, promo: Optional[Dict]) -> float:
+    if not promo:
+        return round(total, 2)
+    pct = max(0, min(100, int(promo["percent"] or 0)))
+    return round(total * (100 - pct) / 100.0, 2)
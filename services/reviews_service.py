@@ -0,0 +1,69 @@
+# services/reviews_service.py
+"""
+Alta/edición/baja de reseñas manteniendo productos.rating_count/rating_sum
+en la misma transacción. El ajuste del agregado es la primera escritura y lee
+la puntuación anterior en la misma sentencia (subconsulta), así que con el
+lock de escritura de SQLite el delta siempre es coherente con la fila.
+"""
+from datetime import datetime
+from sqlalchemy import text
+from models import db
+
+_BUMP_ON_UPDATE_SQL = text("""
+    UPDATE productos
+    SET rating_sum = rating_sum + :r - (SELECT rating FROM reviews WHERE product_id = :p AND user_id = :u)
+    WHERE id = :p AND EXISTS (SELECT 1 FROM reviews WHERE product_id = :p AND user_id = :u)
+""")
+_BUMP_ON_INSERT_SQL = text(
+    "UPDATE productos SET rating_count = rating_count + 1, rating_sum = rating_sum + :r WHERE id = :p"
+)
+_BUMP_ON_DELETE_SQL = text("""
+    UPDATE productos
+    SET rating_count = rating_count - 1,
+        rating_sum = rating_sum - (SELECT rating FROM reviews WHERE product_id = :p AND user_id = :u)
+    WHERE id = :p AND EXISTS (SELECT 1 FROM reviews WHERE product_id = :p AND user_id = :u)
+""")
+
+def save_review(product_id: int, user_id: int, rating: int, comment: str = "") -> str:
+    """Crea o actualiza la reseña del usuario y el agregado. Devuelve "created" | "updated"."""
+    params = {"p": product_id, "u": user_id, "r": int(rating), "c": comment, "now": datetime.utcnow()}
+    try:
+        if db.session.execute(_BUMP_ON_UPDATE_SQL, params).rowcount:
+            db.session.execute(text(
+                "UPDATE reviews SET rating = :r, comment = :c WHERE product_id = :p AND user_id = :u"
+            ), params)
+            result = "updated"
+        else:
+            db.session.execute(text(
+                "INSERT INTO reviews (product_id, user_id, rating, comment, created_at) VALUES (:p, :u, :r, :c, :now)"
+            ), params)
+            db.session.execute(_BUMP_ON_INSERT_SQL, params)
+            result = "created"
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
+def delete_review(product_id: int, user_id: int) -> bool:
+    params = {"p": product_id, "u": user_id}
+    try:
+        if not db.session.execute(_BUMP_ON_DELETE_SQL, params).rowcount:
+            db.session.rollback()
+            return False
+        db.session.execute(text("DELETE FROM reviews WHERE product_id = :p AND user_id = :u"), params)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return True
+
+def recompute_aggregates() -> int:
+    """Backfill/reparación: recalcula rating_count/rating_sum de todos los productos en bloque."""
+    res = db.session.execute(text("""
+        UPDATE productos SET
+          rating_count = (SELECT COUNT(*) FROM reviews r WHERE r.product_id = productos.id),
+          rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews r WHERE r.product_id = productos.id)
+    """))
+    db.session.commit()
+    return res.rowcount
@@ -0,0 +1,271 @@
+# services/tcg_import_service.py
+"""
+Importación masiva de cartas TCG (pokemon-tcg-data) a productos:
+  - los archivos de set se descargan en paralelo (hilos) y se procesan a
+    medida que llegan, sin pausas entre sets
+  - los tcg_card_id existentes se leen con una sola consulta al empezar
+  - las cartas nuevas entran con un executemany INSERT ... ON CONFLICT DO
+    NOTHING (índice único parcial idx_product_tcg_id_unique), así dos
+    importaciones simultáneas no duplican
+  - modo update: refresca en bloque los campos que vienen del upstream
+    (nombre, tipo, imagen, rareza, número, expansión) solo en las filas que
+    cambiaron; precio y stock no se tocan
+  - modo diff (diff_set/apply_diff): compara el set upstream con lo que hay
+    en la base usando productos.content_hash (sha1 de los campos upstream) y
+    aplica en bloque altas, cambios y bajas; devuelve los ids tocados para
+    reindexar solo esos (FTS lo hace el trigger; embeddings reembed_products)
+
+Bajas: una carta que desaparece del upstream se borra si no tiene historial
+(pedidos, reseñas, compras del co-purchase, colecciones de packs en
+user_cards); si lo tiene se retira con stock = 0 para no romper pedidos,
+reseñas ni colecciones, y se marca productos.retired_at: los diffs siguientes
+ya no la proponen como baja (no se pisa un restock manual) y, si vuelve al
+upstream, entra como cambio que la desmarca (el stock no se toca).
+"""
+import hashlib
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import text, bindparam, DateTime
+from models import db, PokemonProducto
+
+TYPE_MAP = {
+    "Fire":"fuego","Water":"agua","Lightning":"eléctrico","Grass":"planta",
+    "Dragon":"dragón","Psychic":"psíquico","Darkness":"siniestro","Fighting":"lucha",
+    "Metal":"acero","Colorless":"incoloro","Fairy":"hada","Ice":"hielo","Rock":"roca",
+}
+
+# campos que se refrescan en modo update (los que define el upstream)
+UPSTREAM_FIELDS = ("nombre", "tipo", "image_url", "descripcion", "expansion", "rarity", "card_number")
+
+_INSERT_SQL = text("""
+    INSERT INTO productos (nombre, tipo, categoria, precio_base, stock, image_url, descripcion,
+                           expansion, rarity, language, condition, card_number, tcg_card_id,
+                           content_hash, market_currency, rating_count, rating_sum, created_at)
+    VALUES (:nombre, :tipo, 'tcg', :precio_base, :stock, :image_url, :descripcion,
+            :expansion, :rarity, :language, :condition, :card_number, :tcg_card_id,
+            :content_hash, 'USD', 0, 0, :created_at)
+    ON CONFLICT DO NOTHING
+""").bindparams(bindparam("created_at", type_=DateTime))
+
+_SET_UPSTREAM = ", ".join(f"{f} = :{f}" for f in UPSTREAM_FIELDS + ("content_hash",))
+_UPDATE_SQL = text(
+    f"UPDATE productos SET {_SET_UPSTREAM}, retired_at = NULL WHERE tcg_card_id = :tcg_card_id "
+    "AND (content_hash IS NOT :content_hash OR retired_at IS NOT NULL)"
+)
+_UPDATE_BY_ID_SQL = text(f"UPDATE productos SET {_SET_UPSTREAM}, retired_at = NULL WHERE id = :id")
+
+# cartas de un set: rango sobre el índice único ('-' < '.' en ASCII)
+_SET_ROWS_SQL = text("""
+    SELECT id, tcg_card_id, content_hash, retired_at FROM productos
+    WHERE tcg_card_id >= :lo AND tcg_card_id < :hi AND tcg_card_id <> ''
+""")
+_IDS_BY_TCG_SQL = text(
+    "SELECT id FROM productos WHERE tcg_card_id IN :tids"
+).bindparams(bindparam("tids", expanding=True))
+
+# historial que impide borrar un producto (se retira con stock 0)
+# (cada tabla se consulta solo si existe; una que falte no desactiva las demás)
+_HISTORY_TABLES = ("order_items", "reviews", "copurchase_items", "user_cards")
+_RETIRE_SQL = text("UPDATE productos SET stock = 0, retired_at = :now WHERE id IN :ids").bindparams(
+    bindparam("ids", expanding=True), bindparam("now", type_=DateTime))
+# datos derivados/efímeros que se van con el producto
+_DEPENDENTS = (
+    ("cart_items", "product_id"), ("wishlist", "product_id"), ("product_views", "product_id"),
+    ("product_embeddings", "product_id"), ("price_history", "product_id"), ("product_sales", "product_id"),
+    ("top_sellers", "product_id"), ("product_neighbors", "product_id"), ("product_neighbors", "neighbor_id"),
+    ("copurchase_pairs", "a"), ("copurchase_pairs", "b"),
+)
+
+def content_hash(row: Dict) -> str:
+    """sha1 de los campos que define el upstream (mismo orden siempre)."""
+    payload = json.dumps([row.get(f) for f in UPSTREAM_FIELDS], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def ensure_unique_index() -> bool:
+    """El ON CONFLICT necesita el índice único; si hay duplicados avisa (dedupe_tcg_by_id)."""
+    try:
+        db.session.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_product_tcg_id_unique "
+            "ON productos(tcg_card_id) WHERE tcg_card_id IS NOT NULL AND tcg_card_id <> ''"
+        ))
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        print(f"[import] sin índice único de tcg_card_id (correr dedupe_tcg_by_id): {e}")
+        return False
+
+def extract_price(c: dict) -> float:
+    price = 9.99
+    tp = c.get("tcgplayer") or {}
+    prices = tp.get("prices") or {}
+    for k in ["holofoil","reverseHolofoil","normal","1stEditionHolofoil","unlimitedHolofoil","rareHoloEX"]:
+        p = prices.get(k) or {}
+        if "market" in p and p["market"]:
+            try:
+                price = max(2.99, float(p["market"]))
+                break
+            except Exception:
+                pass
+    return round(price, 2)
+
+def card_row(c: dict, set_name: str) -> Optional[Dict]:
+    """Fila de productos para una carta del JSON upstream (None si no trae id)."""
+    tid = c.get("id")  # ej: "sv2-12"
+    if not tid:
+        return None
+    name = (c.get("name") or "").strip()
+    card_number = "{}/{}".format(c.get("number", ""), c.get("setTotal") or "?")
+    tipos = c.get("types") or ["Colorless"]
+    imgs = c.get("images") or {}
+    rarity = c.get("rarity") or ""
+    language = "EN"
+    row = {
+        "tcg_card_id": tid,
+        "nombre": "{} - {} {}".format(name, set_name, card_number),
+        "tipo": TYPE_MAP.get(tipos[0], "incoloro"),
+        "image_url": imgs.get("large") or imgs.get("small"),
+        # descripcion sin caracteres especiales para evitar mojibake
+        "descripcion": "Carta TCG - Expansion: {} - Rareza: {} - Idioma: {} - Nro: {}".format(
+            set_name, rarity, language, card_number
+        ),
+        "expansion": set_name,
+        "rarity": rarity,
+        "card_number": card_number,
+        "language": language,
+        "condition": "NM",
+        "precio_base": extract_price(c),
+    }
+    row["content_hash"] = content_hash(row)
+    return row
+
+def existing_tcg_ids() -> Set[str]:
+    """Todos los tcg_card_id ya importados, en una consulta."""
+    return {tid for (tid,) in db.session.query(PokemonProducto.tcg_card_id)
+            .filter(PokemonProducto.tcg_card_id.isnot(None), PokemonProducto.tcg_card_id != "")}
+
+def import_rows(rows: List[Dict], existing: Set[str], update: bool = False) -> Tuple[int, int]:
+    """
+    Inserta las filas nuevas y, con update=True, refresca las existentes que
+    cambiaron. Actualiza `existing` y hace commit (una transacción por set).
+    Devuelve (añadidas, actualizadas).
+    """
+    now = datetime.utcnow()
+    new = [dict(r, stock=random.randint(1, 20), created_at=now) for r in rows if r["tcg_card_id"] not in existing]
+    old = [{f: r[f] for f in UPSTREAM_FIELDS + ("tcg_card_id", "content_hash")}
+           for r in rows if r["tcg_card_id"] in existing]
+    added = updated = 0
+    if new:
+        added = db.session.execute(_INSERT_SQL, new).rowcount
+        existing.update(r["tcg_card_id"] for r in new)
+    if update and old:
+        updated = db.session.execute(_UPDATE_SQL, old).rowcount
+    db.session.commit()
+    return max(added, 0), max(updated, 0)
+
+def diff_set(code: str, rows: List[Dict]) -> Dict[str, List]:
+    """
+    Compara las filas upstream de un set con la base (una consulta por rango
+    de tcg_card_id). Devuelve {"insert": [filas], "update": [filas con id],
+    "delete": [(id, tcg_card_id)]}. Sin filas upstream no se proponen bajas
+    (un set vacío suele ser una descarga fallida, no un borrado). Las ya
+    retiradas no vuelven a ser baja; si reaparecen van a "update" con
+    restored=True aunque el hash no haya cambiado.
+    """
+    prefix = code.lower() + "-"
+    current = {tid: (pid, h, retired is not None) for pid, tid, h, retired in db.session.execute(
+        _SET_ROWS_SQL, {"lo": prefix, "hi": code.lower() + "."}
+    )}
+    upstream = {r["tcg_card_id"]: r for r in rows}
+    inserts, updates = [], []
+    for tid, r in upstream.items():
+        if tid not in current:
+            inserts.append(r)
+        else:
+            pid, h, retired = current[tid]
+            if retired or h != r["content_hash"]:
+                updates.append(dict(r, id=pid, restored=retired))
+    deletes = [(pid, tid) for tid, (pid, _, retired) in current.items()
+               if tid not in upstream and not retired] if upstream else []
+    return {"insert": inserts, "update": updates, "delete": deletes}
+
+def _existing_tables() -> Set[str]:
+    return {n for (n,) in db.session.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))}
+
+def apply_diff(diff: Dict[str, List]) -> Dict:
+    """
+    Aplica un diff_set en una transacción: executemany de altas y cambios,
+    bajas en bloque. Devuelve los contadores (restored: retiradas que volvieron
+    al upstream) y `changed_ids` (altas + cambios) para reindexar solo esas filas.
+    """
+    now = datetime.utcnow()
+    res = {"inserted": 0, "updated": 0, "deleted": 0, "retired": 0, "restored": 0, "changed_ids": []}
+    if diff["insert"]:
+        rows = [dict(r, stock=random.randint(1, 20), created_at=now) for r in diff["insert"]]
+        res["inserted"] = max(db.session.execute(_INSERT_SQL, rows).rowcount, 0)
+        res["changed_ids"] += [pid for (pid,) in db.session.execute(
+            _IDS_BY_TCG_SQL, {"tids": [r["tcg_card_id"] for r in rows]}
+        )]
+    if diff["update"]:
+        cols = UPSTREAM_FIELDS + ("content_hash", "id")
+        db.session.execute(_UPDATE_BY_ID_SQL, [{f: r[f] for f in cols} for r in diff["update"]])
+        res["updated"] = len(diff["update"])
+        res["restored"] = sum(1 for r in diff["update"] if r.get("restored"))
+        res["changed_ids"] += [r["id"] for r in diff["update"]]
+    if diff["delete"]:
+        ids = [pid for pid, _ in diff["delete"]]
+        tables = _existing_tables()
+        keep = set()
+        history = [t for t in _HISTORY_TABLES if t in tables]
+        if history:
+            history_sql = text(
+                " UNION ".join(f"SELECT product_id FROM {t} WHERE product_id IN :ids" for t in history)
+            ).bindparams(bindparam("ids", expanding=True))
+            keep = {pid for (pid,) in db.session.execute(history_sql, {"ids": ids})}
+        drop = [pid for pid in ids if pid not in keep]
+        if keep:
+            db.session.execute(_RETIRE_SQL, {"ids": sorted(keep), "now": now})
+        if drop:
+            for table, col in _DEPENDENTS:
+                if table in tables:
+                    db.session.execute(
+                        text(f"DELETE FROM {table} WHERE {col} IN :ids").bindparams(bindparam("ids", expanding=True)),
+                        {"ids": drop},
+                    )
+            db.session.execute(
+                text("DELETE FROM productos WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": drop},
+            )
+        res["deleted"], res["retired"] = len(drop), len(keep)
+    db.session.commit()
+    return res
+
+def reembed_products(ids: Iterable[int]) -> int:
+    """Recalcula embeddings solo de esos productos (si existe product_embeddings)."""
+    ids = list(ids)
+    if not ids or "product_embeddings" not in _existing_tables():
+        return 0
+    from ai.search_service import upsert_product_embedding
+    n = 0
+    for p in PokemonProducto.query.filter(PokemonProducto.id.in_(ids)).all():
+        upsert_product_embedding(p)
+        n += 1
+    return n
+
+def fetch_parallel(codes: Iterable[str], load: Callable[[str], Tuple[List[dict], str]],
+                   workers: int = 8) -> Iterator[Tuple[str, List[dict], str]]:
+    """(code, cartas, nombre_set) a medida que termina cada descarga; la escritura sigue en el hilo que itera."""
+    codes = list(codes)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futs = {pool.submit(load, code): code for code in codes}
+        for fut in as_completed(futs):
+            code = futs[fut]
+            try:
+                cards, set_name = fut.result()
+            except Exception as e:
+                print(f"[import] {code}: {e}")
+                cards, set_name = [], code.upper()
+            yield code, cards, set_name
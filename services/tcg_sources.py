@@ -0,0 +1,242 @@
+# services/tcg_sources.py
+"""
+Orígenes de datos de pokemon-tcg-data para el importador y list_tcg_sets:
+  - GithubSource:  raw.githubusercontent.com + API de contenidos (con la caché
+                   HTTP en disco); es el comportamiento de siempre
+  - LocalSource:   un clon local del repo (lee cards/en/*.json y sets/en.json)
+  - TarballSource: el tarball (.tar, .tar.gz, .tgz) que descarga GitHub,
+                   leído sin extraerlo a disco
+
+Todos exponen sets_index() -> {set_id: nombre}, set_ids() -> [set_id],
+iter_cards(set_id) -> iterador de cartas (dict) e iter_sets(codes) ->
+(set_id, cartas) en el orden más barato para el origen. En los orígenes
+locales los archivos se parsean en streaming (iter_json_array): en memoria
+solo está la carta actual y un bloque de lectura, no el set entero.
+
+open_source(spec) elige según el argumento (o TCG_DATA_SOURCE): vacío ->
+GitHub, directorio -> LocalSource, archivo .tar* / .tgz -> TarballSource.
+"""
+import codecs
+import io
+import json
+import os
+import re
+import tarfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from services.http_cache import cached_get
+
+RAW_BASE = "https://raw.githubusercontent.com/PokemonTCG/pokemon-tcg-data/master"
+GH_CARDS_EN = "https://api.github.com/repos/PokemonTCG/pokemon-tcg-data/contents/cards/en"
+CHUNK_SIZE = 64 * 1024
+
+_SKIP = re.compile(r"[\s,]*")
+_WS = re.compile(r"\s*")
+
+
+def iter_json_array(fp, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Recorre un array JSON de primer nivel elemento a elemento leyendo `fp`
+    (binario o texto) por bloques; el buffer nunca guarda más que el elemento
+    en curso + un bloque.
+    """
+    binary = not isinstance(fp, io.TextIOBase)
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    dec = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        raw = fp.read(chunk_size)
+        data = utf8.decode(raw, final=not raw) if binary else raw
+        if not raw:
+            eof = True
+            if not data:
+                return False
+        buf, pos = buf[pos:] + data, 0
+        return True
+
+    while True:  # hasta el '['
+        pos = _SKIP.match(buf, pos).end()
+        if pos < len(buf):
+            break
+        if not fill():
+            return
+    if buf[pos] != "[":
+        raise ValueError("se esperaba un array JSON")
+    pos += 1
+
+    while True:
+        pos = _SKIP.match(buf, pos).end()
+        if pos >= len(buf):
+            if not fill():
+                raise ValueError("array JSON incompleto")
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = dec.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if not fill():
+                raise
+            continue
+        # un número o literal cortado por el bloque ("1." de "1.5") también
+        # decodifica: solo vale si detrás viene ',' o ']'
+        nxt = _WS.match(buf, end).end()
+        if nxt >= len(buf) or buf[nxt] not in ",]":
+            if fill():
+                continue
+            if nxt >= len(buf):
+                raise ValueError("array JSON incompleto")
+            raise json.JSONDecodeError("se esperaba ',' o ']'", buf, nxt)
+        pos = end
+        yield obj
+
+
+def _sets_from(entries) -> Dict[str, str]:
+    idx = {}
+    for s in entries:
+        sid = (s.get("id") or "").lower()
+        if sid:
+            idx[sid] = s.get("name") or sid.upper()
+    return idx
+
+
+class _Source:
+    remote = False
+
+    def iter_sets(self, codes) -> Iterator[Tuple[str, Iterator[dict]]]:
+        for code in codes:
+            yield code, self.iter_cards(code)
+
+
+class GithubSource(_Source):
+    """Red: raw.githubusercontent.com (cartas, índice) y la API de contenidos (listado)."""
+    remote = True
+
+    def __init__(self, raw_base: str = RAW_BASE, user_agent: str = "PokeShop/tcg-import"):
+        self.raw_base = raw_base.rstrip("/")
+        self.headers = {"User-Agent": user_agent}
+        self._index: Optional[Dict[str, str]] = None
+
+    def __str__(self) -> str:
+        return self.raw_base
+
+    def _json(self, url: str):
+        r = cached_get(url, headers=self.headers, timeout=30)
+        r.raise_for_status()
+        return r.json()
+
+    def sets_index(self) -> Dict[str, str]:
+        if self._index is None:
+            self._index = _sets_from(self._json(f"{self.raw_base}/sets/en.json") or [])
+        return self._index
+
+    def set_ids(self) -> List[str]:
+        names = (e.get("name", "") for e in self._json(GH_CARDS_EN) or [])
+        return sorted(n[:-5] for n in names if n.endswith(".json"))
+
+    def iter_cards(self, set_code: str) -> Iterator[dict]:
+        data = self._json(f"{self.raw_base}/cards/en/{set_code}.json")
+        return iter(data if isinstance(data, list) else [])
+
+
+class LocalSource(_Source):
+    """Clon local de pokemon-tcg-data (la raíz que contiene cards/ y sets/)."""
+
+    def __init__(self, root: str, chunk_size: int = CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self._index: Optional[Dict[str, str]] = None
+
+    def __str__(self) -> str:
+        return self.root
+
+    def _iter(self, *parts: str) -> Iterator:
+        path = os.path.join(self.root, *parts)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            yield from iter_json_array(f, self.chunk_size)
+
+    def sets_index(self) -> Dict[str, str]:
+        if self._index is None:
+            self._index = _sets_from(self._iter("sets", "en.json"))
+        return self._index
+
+    def set_ids(self) -> List[str]:
+        d = os.path.join(self.root, "cards", "en")
+        return sorted(n[:-5] for n in os.listdir(d) if n.endswith(".json"))
+
+    def iter_cards(self, set_code: str) -> Iterator[dict]:
+        return self._iter("cards", "en", f"{set_code}.json")
+
+
+class TarballSource(_Source):
+    """
+    Tarball de GitHub (pokemon-tcg-data-master/cards/en/...), leído sin
+    extraer. Un gzip no admite acceso aleatorio barato, así que se lee en
+    pasadas secuenciales: una al abrir (índice de sets y listado de cartas) y
+    una por llamada a iter_sets.
+    """
+
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._index: Dict[str, str] = {}
+        self._cards: Dict[str, str] = {}  # set_id -> nombre del miembro
+        with tarfile.open(path, "r|*") as tf:
+            for m in tf:
+                rel = self._rel(m)
+                if rel == "sets/en.json":
+                    self._index = _sets_from(iter_json_array(tf.extractfile(m), chunk_size))
+                elif rel and rel.startswith("cards/en/"):
+                    self._cards[rel[len("cards/en/"):-5]] = m.name
+
+    @staticmethod
+    def _rel(m) -> Optional[str]:
+        """Ruta desde cards/ o sets/, sea cual sea el prefijo: "x/cards/en/sv1.json" -> "cards/en/sv1.json"."""
+        if not m.isfile() or not m.name.endswith(".json"):
+            return None
+        parts = m.name.split("/")
+        for i, seg in enumerate(parts):
+            if seg in ("cards", "sets"):
+                return "/".join(parts[i:])
+        return None
+
+    def __str__(self) -> str:
+        return self.path
+
+    def sets_index(self) -> Dict[str, str]:
+        return self._index
+
+    def set_ids(self) -> List[str]:
+        return sorted(self._cards)
+
+    def iter_sets(self, codes) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """Una sola pasada por el tarball, en el orden en que están los sets."""
+        wanted = {c.lower() for c in codes}
+        with tarfile.open(self.path, "r|*") as tf:
+            for m in tf:
+                rel = self._rel(m)
+                code = rel[len("cards/en/"):-5] if rel and rel.startswith("cards/en/") else None
+                if code and code.lower() in wanted:
+                    yield code, iter_json_array(tf.extractfile(m), self.chunk_size)
+
+    def iter_cards(self, set_code: str) -> Iterator[dict]:
+        for _, cards in self.iter_sets([set_code]):
+            yield from cards
+
+
+def open_source(spec: Optional[str] = None):
+    """None/"" -> GitHub; directorio -> LocalSource; .tar/.tar.gz/.tgz -> TarballSource."""
+    spec = spec if spec is not None else os.getenv("TCG_DATA_SOURCE", "")
+    if not spec or spec.lower() in ("github", "remote"):
+        return GithubSource()
+    if os.path.isdir(spec):
+        return LocalSource(spec)
+    if os.path.isfile(spec) and tarfile.is_tarfile(spec):
+        return TarballSource(spec)
+    raise ValueError(f"Origen de datos TCG no válido: {spec}")
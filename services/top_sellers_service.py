@@ -0,0 +1,114 @@
+# services/top_sellers_service.py
+"""
+Más vendidos materializados. product_sales lleva las unidades vendidas por
+producto (el checkout las suma en su misma transacción) y top_sellers guarda,
+por cada (scope, clave), los TOP_N primeros ya ordenados:
+  - "tipo":      productos.tipo
+  - "expansion": productos.expansion
+  - "set":       prefijo del tcg_card_id ("sv2-12" -> "sv2")
+La ficha de producto lee el ranking con una consulta por PK
+(scope, scope_key, rank). Tras un checkout se recalculan solo las particiones
+de los productos vendidos; rebuild_all() lo reconstruye todo desde order_items.
+"""
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import text
+from models import db, PokemonProducto, TopSeller
+
+TOP_N = 20
+
+# expresión SQL de la clave de cada scope (sobre productos p)
+_SCOPE_KEY_SQL = {
+    "tipo": "p.tipo",
+    "expansion": "p.expansion",
+    "set": "lower(substr(p.tcg_card_id, 1, instr(p.tcg_card_id, '-') - 1))",
+}
+
+_ADD_SALES_SQL = text("""
+    INSERT INTO product_sales (product_id, sold) VALUES (:pid, :q)
+    ON CONFLICT(product_id) DO UPDATE SET sold = sold + excluded.sold
+""")
+
+def set_code_of(tcg_card_id: Optional[str]) -> str:
+    return tcg_card_id.split("-")[0].lower() if tcg_card_id and "-" in tcg_card_id else ""
+
+def record_sales(lines: Iterable[Dict]) -> None:
+    """Suma unidades vendidas (executemany). No hace commit: va dentro del checkout."""
+    rows = [{"pid": int(ln["product_id"]), "q": int(ln["qty"])} for ln in lines]
+    if rows:
+        db.session.execute(_ADD_SALES_SQL, rows)
+
+def _refresh_partition(scope: str, key: str) -> None:
+    key_sql = _SCOPE_KEY_SQL[scope]
+    db.session.execute(text("DELETE FROM top_sellers WHERE scope = :s AND scope_key = :k"), {"s": scope, "k": key})
+    db.session.execute(text(f"""
+        INSERT INTO top_sellers (scope, scope_key, rank, product_id, sold)
+        SELECT :s, :k, ROW_NUMBER() OVER (ORDER BY ps.sold DESC, p.id), p.id, ps.sold
+        FROM product_sales ps JOIN productos p ON p.id = ps.product_id
+        WHERE ps.sold > 0 AND {key_sql} = :k
+        ORDER BY ps.sold DESC, p.id
+        LIMIT :n
+    """), {"s": scope, "k": key, "n": TOP_N})
+
+def refresh_for_products(product_ids: Iterable[int]) -> int:
+    """Recalcula solo las particiones (tipo/expansión/set) de esos productos y hace commit."""
+    ids = sorted({int(i) for i in product_ids})
+    if not ids:
+        return 0
+    keys = set()
+    for tipo, expansion, tcg_id in (
+        db.session.query(PokemonProducto.tipo, PokemonProducto.expansion, PokemonProducto.tcg_card_id)
+        .filter(PokemonProducto.id.in_(ids))
+        .all()
+    ):
+        for scope, key in (("tipo", tipo), ("expansion", expansion), ("set", set_code_of(tcg_id))):
+            if key:
+                keys.add((scope, key))
+    try:
+        for scope, key in sorted(keys):
+            _refresh_partition(scope, key)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(keys)
+
+def rebuild_all() -> Dict[str, int]:
+    """Reconstruye product_sales desde order_items y todos los rankings (una sentencia por scope)."""
+    try:
+        db.session.execute(text("DELETE FROM product_sales"))
+        db.session.execute(text("""
+            INSERT INTO product_sales (product_id, sold)
+            SELECT product_id, SUM(quantity) FROM order_items GROUP BY product_id
+        """))
+        db.session.execute(text("DELETE FROM top_sellers"))
+        out = {}
+        for scope, key_sql in _SCOPE_KEY_SQL.items():
+            res = db.session.execute(text(f"""
+                INSERT INTO top_sellers (scope, scope_key, rank, product_id, sold)
+                SELECT :s, k, rn, id, sold FROM (
+                    SELECT {key_sql} AS k, p.id AS id, ps.sold AS sold,
+                           ROW_NUMBER() OVER (PARTITION BY {key_sql} ORDER BY ps.sold DESC, p.id) AS rn
+                    FROM product_sales ps JOIN productos p ON p.id = ps.product_id
+                    WHERE ps.sold > 0
+                ) WHERE k IS NOT NULL AND k <> '' AND rn <= :n
+            """), {"s": scope, "n": TOP_N})
+            out[scope] = res.rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return out
+
+def top_sellers(scope: str, key: Optional[str], exclude_id: Optional[int] = None,
+                limit: int = 4) -> List[PokemonProducto]:
+    """Ranking ya calculado para (scope, clave): una consulta por el índice de la PK."""
+    if not key:
+        return []
+    q = (
+        db.session.query(PokemonProducto)
+        .join(TopSeller, TopSeller.product_id == PokemonProducto.id)
+        .filter(TopSeller.scope == scope, TopSeller.scope_key == key)
+    )
+    if exclude_id is not None:
+        q = q.filter(TopSeller.product_id != exclude_id)
+    return q.order_by(TopSeller.rank).limit(limit).all()
@@ -0,0 +1,132 @@
+# services/view_events_service.py
+"""
+Ingesta de vistas de producto fuera del request: la ruta solo encola
+(user_id, product_id, ts) en una cola acotada y un hilo de fondo las escribe
+con un único executemany cada `batch_size` eventos o `flush_ms` milisegundos.
+Si la cola está llena el evento se descarta y se cuenta en `dropped`
+(una vista perdida es preferible a bloquear la página). El hilo arranca con
+el primer record() (los scripts que solo llaman a create_app() no lo crean, y
+en servidores pre-fork arranca en cada worker, no en el padre). Al salir del
+proceso se vacía la cola (atexit). Los lotes fallidos y las vistas descartadas
+se registran en `logger` (el de la app si se pasa; si no, el del módulo).
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import text
+
+_INSERT_SQL = text("INSERT INTO product_views (user_id, product_id, ts) VALUES (:u, :p, :ts)")
+DROP_LOG_EVERY = 1000  # con la cola llena, un aviso por cada tantas vistas descartadas
+
+class ViewEventQueue:
+    def __init__(self, engine, batch_size: int = 200, flush_ms: int = 500, maxsize: int = 10000,
+                 logger: Optional[logging.Logger] = None):
+        self.engine = engine
+        self.logger = logger or logging.getLogger(__name__)
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self._q: "queue.Queue[dict]" = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self) -> "ViewEventQueue":
+        """Arranca el hilo de escritura en este proceso (idempotente; tras un fork lo vuelve a crear)."""
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="view-events", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+        return self
+
+    def record(self, user_id: Optional[int], product_id: int) -> bool:
+        """No bloquea: devuelve False si el evento se descartó. Arranca el hilo si hace falta."""
+        if self._thread is None or self._pid != os.getpid():
+            self.start()
+        try:
+            self._q.put_nowait({"u": user_id, "p": product_id, "ts": datetime.utcnow()})
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % DROP_LOG_EVERY == 0:
+                self.logger.warning(f"view_events queue full: {dropped} views dropped so far")
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _drain(self) -> list:
+        rows = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: list) -> None:
+        if not rows:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(_INSERT_SQL, rows)
+            with self._lock:
+                self.written += len(rows)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(rows)
+            self.logger.error(f"view_events write error ({len(rows)} views): {e}", exc_info=True)
+
+    def _run(self) -> None:
+        timeout = self.flush_ms / 1000.0
+        while not self._stop.is_set():
+            deadline = time.monotonic() + timeout
+            rows = []
+            # acumula hasta batch_size o hasta que venza flush_ms
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(rows)
+        self.flush()
+
+    def flush(self) -> None:
+        """Escribe todo lo pendiente (en lotes de batch_size)."""
+        while True:
+            rows = self._drain()
+            if not rows:
+                break
+            self._write(rows)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": self._q.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }